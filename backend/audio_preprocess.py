@@ -0,0 +1,180 @@
+import io
+import wave
+import struct
+
+from streaming_transcriber import wav_info
+
+# NumPy is optional (e.g. provided by a Lambda layer); without it uploads are
+# passed through unchanged
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
+TARGET_SAMPLE_RATE = 16000
+
+# Energy-based silence detection
+FRAME_MS = 20
+SILENCE_THRESHOLD_DB = -40.0  # frames quieter than this (dBFS) count as silence
+PAD_MS = 200                  # keep this much audio around the speech
+
+# Windowed-sinc anti-aliasing filter used before downsampling
+FILTER_TAPS = 63
+
+# Long recordings are cut where the signal is quietest within this many
+# seconds either side of each nominal cut point
+SPLIT_SEARCH_SECONDS = 3.0
+
+SAMPLE_TYPES = {8: 'u1', 16: '<i2', 32: '<i4'}
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+
+def available():
+    """Whether the NumPy preprocessing stage can run"""
+    return np is not None
+
+def wav_format_tag(audio):
+    """Format code from the fmt chunk (1 = integer PCM, 3 = IEEE float)"""
+    offset = bytes(audio[:256]).find(b'fmt ')
+    return struct.unpack_from('<H', audio, offset + 8)[0] if offset >= 0 else None
+
+def decode_pcm(audio):
+    """Decode PCM WAV into (float32 samples shaped (frames, channels) in [-1, 1], sample_rate)"""
+    sample_rate, channels, bits, offset, length = wav_info(audio)
+    is_float = bits == 32 and wav_format_tag(audio) == WAVE_FORMAT_IEEE_FLOAT
+    if bits not in SAMPLE_TYPES:
+        raise ValueError(f"Unsupported WAV sample width: {bits} bits")
+
+    frames = length // (channels * bits // 8)
+    dtype = '<f4' if is_float else SAMPLE_TYPES[bits]
+    samples = np.frombuffer(audio, dtype=dtype, count=frames * channels, offset=offset)
+    samples = samples.reshape(frames, channels).astype(np.float32)
+    if is_float:
+        return samples, sample_rate
+    if bits == 8:
+        samples -= 128.0
+    samples /= float(2 ** (bits - 1))
+    return samples, sample_rate
+
+def frame_energy_db(mono, sample_rate, frame_ms=FRAME_MS):
+    """RMS level in dBFS of consecutive frame_ms frames, and the frame length in samples"""
+    frame = max(1, sample_rate * frame_ms // 1000)
+    count = len(mono) // frame
+    frames = mono[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20.0 * np.log10(rms + 1e-10), frame
+
+def trim_silence(mono, sample_rate, frame_ms=FRAME_MS, threshold_db=SILENCE_THRESHOLD_DB, pad_ms=PAD_MS):
+    """Cut leading and trailing frames whose RMS energy is below threshold_db"""
+    energy, frame = frame_energy_db(mono, sample_rate, frame_ms)
+    if len(energy) == 0:
+        return mono
+    voiced = np.flatnonzero(energy > threshold_db)
+
+    pad = sample_rate * pad_ms // 1000
+    if len(voiced) == 0:
+        # Nothing but silence; keep a sliver so Transcribe still gets valid audio
+        return mono[:pad]
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(mono), (voiced[-1] + 1) * frame + pad)
+    return mono[start:end]
+
+def split_points(mono, sample_rate, segment_seconds, search_seconds=SPLIT_SEARCH_SECONDS):
+    """Sample offsets to cut at: the quietest frame near every segment_seconds"""
+    energy, frame = frame_energy_db(mono, sample_rate)
+    segment_frames = int(segment_seconds * sample_rate / frame)
+    search_frames = int(search_seconds * sample_rate / frame)
+
+    points = []
+    nominal = segment_frames
+    while nominal + search_frames < len(energy):
+        window = energy[nominal - search_frames:nominal + search_frames]
+        cut = nominal - search_frames + int(np.argmin(window))
+        points.append(cut * frame)
+        # Measure the next segment from the actual cut
+        nominal = cut + segment_frames
+    return points
+
+def lowpass_kernel(cutoff, taps=FILTER_TAPS):
+    """Hamming-windowed sinc low-pass; cutoff is a fraction of the sample rate (0-0.5)"""
+    n = np.arange(taps) - (taps - 1) / 2.0
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+def decimate(signal, factor, kernel):
+    """Low-pass and keep every factor-th sample, filtering only the samples kept"""
+    half = len(kernel) // 2
+    windows = sliding_window_view(np.pad(signal, half), len(kernel))[::factor]
+    return windows @ kernel[::-1]
+
+def interpolate(signal, source_rate, target_rate):
+    """Linear-interpolation resampling (no filtering)"""
+    count = len(signal) * target_rate // source_rate
+    positions = np.arange(count) * (source_rate / float(target_rate))
+    index = np.minimum(positions.astype(np.int64), len(signal) - 2)
+    fraction = (positions - index).astype(np.float32)
+    # Sample positions are evenly spaced, so index directly instead of np.interp's search
+    return signal[index] * (1 - fraction) + signal[index + 1] * fraction
+
+def resample(signal, source_rate, target_rate):
+    """Resample a mono signal, filtering first when downsampling"""
+    if source_rate == target_rate or len(signal) < 2:
+        return signal
+    if target_rate > source_rate:
+        return interpolate(signal, source_rate, target_rate)
+
+    # Other rates (e.g. 44.1 kHz) are first brought up to the next multiple of
+    # the target, so the filter only runs on the samples that are kept
+    factor = -(-source_rate // target_rate)
+    if source_rate != factor * target_rate:
+        signal = interpolate(signal, source_rate, factor * target_rate)
+    return decimate(signal, factor, lowpass_kernel(0.5 / factor))
+
+def encode_wav(signal, sample_rate):
+    """16-bit mono PCM WAV bytes"""
+    pcm = np.clip(np.round(signal * 32767.0), -32768, 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def split_wav(audio, segment_seconds, search_seconds=SPLIT_SEARCH_SECONDS):
+    """Split a WAV recording at pauses into mono 16-bit WAVs of roughly segment_seconds each"""
+    samples, sample_rate = decode_pcm(audio)
+    channels = samples.shape[1]
+    mono = samples @ np.full(channels, 1.0 / channels, dtype=np.float32) if channels > 1 else samples[:, 0]
+
+    bounds = [0] + split_points(mono, sample_rate, segment_seconds, search_seconds) + [len(mono)]
+    return [encode_wav(mono[start:end], sample_rate) for start, end in zip(bounds, bounds[1:])]
+
+def normalize_wav(audio, target_rate=TARGET_SAMPLE_RATE):
+    """Trim silence, downmix to mono and resample a WAV upload
+
+    Returns (wav_bytes, stats) where stats reports durations before and after
+    and how many seconds of silence were trimmed.
+    """
+    samples, sample_rate = decode_pcm(audio)
+    original_seconds = len(samples) / float(sample_rate)
+
+    channels = samples.shape[1]
+    # A matrix product averages the interleaved channels much faster than mean(axis=1)
+    mono = samples @ np.full(channels, 1.0 / channels, dtype=np.float32) if channels > 1 else samples[:, 0]
+    mono = trim_silence(mono, sample_rate)
+    trimmed_seconds = original_seconds - len(mono) / float(sample_rate)
+
+    mono = resample(mono, sample_rate, target_rate)
+    output = encode_wav(mono, target_rate)
+
+    return output, {
+        'originalSeconds': round(original_seconds, 3),
+        'seconds': round(len(mono) / float(target_rate), 3),
+        'trimmedSeconds': round(trimmed_seconds, 3),
+        'originalBytes': len(audio),
+        'bytes': len(output),
+        'originalSampleRate': sample_rate,
+        'originalChannels': channels
+    }
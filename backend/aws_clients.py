@@ -0,0 +1,65 @@
+import os
+import threading
+
+# Connection pooling and keep-alive shared by every client. The pool is sized
+# for the fan-out thread pool plus the streaming upload.
+CLIENT_CONFIG = {
+    'max_pool_connections': int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 32)),
+    'tcp_keepalive': True,
+    'connect_timeout': 5,
+    'read_timeout': 60,
+    'retries': {'max_attempts': 3, 'mode': 'standard'}
+}
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+
+
+def get_client(service):
+    """Return the shared client for a service, creating it on first use"""
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                client = _create_client(service)
+                _clients[service] = client
+    return client
+
+def _create_client(service):
+    # boto3 itself is only imported once a client is actually needed
+    global _session
+    import boto3
+    from botocore.config import Config
+
+    if _session is None:
+        # One session, so service models and credentials are loaded only once
+        _session = boto3.session.Session()
+    return _session.client(service, endpoint_url=endpoint_url(service), config=Config(**CLIENT_CONFIG))
+
+def endpoint_url(service):
+    """Endpoint override for a service, e.g. a local stand-in, or None for AWS itself
+
+    AWS_ENDPOINT_URL_<SERVICE> (e.g. AWS_ENDPOINT_URL_S3) takes precedence
+    over AWS_ENDPOINT_URL, which applies to every service.
+    """
+    return os.environ.get(f"AWS_ENDPOINT_URL_{service.upper()}") or os.environ.get('AWS_ENDPOINT_URL')
+
+def warm_up(services=('s3', 'transcribe', 'translate', 'polly')):
+    """Create clients ahead of the first request, e.g. during provisioned-concurrency init"""
+    for service in services:
+        get_client(service)
+
+
+class LazyClient:
+    """Stands in for a boto3 client and builds the real one on first attribute access"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, name):
+        return getattr(get_client(self.service), name)
+
+    def __repr__(self):
+        return f"LazyClient({self.service!r})"
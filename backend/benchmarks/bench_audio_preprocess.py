@@ -0,0 +1,62 @@
+"""Throughput of WAV normalization (silence trim, downmix, resample to 16 kHz)
+
+Synthetic recordings are stereo tones with noise-floor silence at both ends,
+the way a browser recording with a slow start and stop looks. Needs NumPy.
+
+Run from the backend directory:
+
+    python benchmarks/bench_audio_preprocess.py [minutes ...]
+"""
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_preprocess import normalize_wav
+
+FORMATS = ((48000, 2), (44100, 2), (16000, 1))
+LEAD_SILENCE_SECONDS = 3.0
+TAIL_SILENCE_SECONDS = 5.0
+
+
+def synthetic_wav(minutes, sample_rate, channels, seed=0):
+    """16-bit WAV: silence, `minutes` of modulated tones, silence"""
+    rng = np.random.default_rng(seed)
+    speech = int(minutes * 60 * sample_rate)
+    t = np.arange(speech) / float(sample_rate)
+    # 220 Hz and 1.1 kHz tones with a syllable-rate envelope
+    signal = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 1100 * t)) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    lead = np.zeros(int(LEAD_SILENCE_SECONDS * sample_rate))
+    tail = np.zeros(int(TAIL_SILENCE_SECONDS * sample_rate))
+    mono = np.concatenate([lead, signal, tail])
+    mono += rng.normal(0, 0.001, len(mono))  # about -60 dBFS noise floor
+
+    pcm = (np.clip(mono, -1, 1) * 32767).astype('<i2')
+    pcm = np.repeat(pcm[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+if __name__ == '__main__':
+    durations = [float(arg) for arg in sys.argv[1:]] or [1, 5, 10]
+    print(f"{'input':>16} {'in MB':>7} {'out MB':>7} {'trimmed s':>10} {'ms':>8} {'x realtime':>11} {'MB/s':>7}")
+    for minutes in durations:
+        for sample_rate, channels in FORMATS:
+            audio = synthetic_wav(minutes, sample_rate, channels)
+            start = time.perf_counter()
+            output, stats = normalize_wav(audio)
+            elapsed = time.perf_counter() - start
+
+            label = f"{minutes:g} min {sample_rate // 1000}k/{channels}ch"
+            print(f"{label:>16} {len(audio) / 1e6:>7.1f} {len(output) / 1e6:>7.1f} {stats['trimmedSeconds']:>10.2f} "
+                  f"{elapsed * 1000:>8.1f} {stats['originalSeconds'] / elapsed:>11.0f} {len(audio) / 1e6 / elapsed:>7.0f}")
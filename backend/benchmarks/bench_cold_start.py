@@ -0,0 +1,54 @@
+"""Cold-start cost of lambda_function with lazy versus eager AWS clients
+
+Each run is a fresh interpreter that imports lambda_function and handles one
+request. Needs boto3 and AWS credentials/region in the environment (no calls
+are made to AWS; clients are only constructed).
+
+Run from the backend directory:
+
+    python benchmarks/bench_cold_start.py [runs]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Import the handler, then serve a CORS preflight and a bad status request,
+# which only touches S3
+PROBE = """
+import json, time
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+lambda_function.lambda_handler({'httpMethod': 'OPTIONS'}, None)
+lambda_function.s3.meta
+invoked = time.perf_counter()
+print(json.dumps({'import': imported - start, 'firstInvocation': invoked - imported}))
+"""
+
+
+def run_once(eager):
+    env = dict(os.environ, AWS_CLIENTS_EAGER='1' if eager else '0')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{'mode':>6} {'import (ms)':>12} {'first call (ms)':>16} {'total (ms)':>11}")
+    for eager in (True, False):
+        samples = [run_once(eager) for _ in range(runs)]
+        imported = statistics.median(s['import'] for s in samples) * 1000
+        invoked = statistics.median(s['firstInvocation'] for s in samples) * 1000
+        print(f"{'eager' if eager else 'lazy':>6} {imported:>12.1f} {invoked:>16.1f} {imported + invoked:>11.1f}")
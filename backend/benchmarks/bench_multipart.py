@@ -0,0 +1,82 @@
+"""Throughput and peak memory of the multipart parser versus the old split-based one
+
+Run from the backend directory:
+
+    python benchmarks/bench_multipart.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from multipart import parse_multipart
+
+BOUNDARY = b'----WebKitFormBoundary7MA4YWxkTrZu0gW'
+
+
+def legacy_parse_multipart(body, boundary):
+    """The parser lambda_function used before multipart.py"""
+    boundary = b'--' + boundary
+    parts = {}
+    for part in body.split(boundary):
+        if not part or part == b'--\r\n' or part == b'--':
+            continue
+        try:
+            headers_raw, content = part.split(b'\r\n\r\n', 1)
+            content_disposition = None
+            for header in headers_raw.split(b'\r\n'):
+                if header.lower().startswith(b'content-disposition:'):
+                    content_disposition = header.decode('utf-8')
+                    break
+            if content_disposition:
+                name_match = content_disposition.find('name="')
+                if name_match != -1:
+                    name_start = name_match + 6
+                    name_end = content_disposition.find('"', name_start)
+                    field_name = content_disposition[name_start:name_end]
+                    if content.endswith(b'\r\n'):
+                        content = content[:-2]
+                    parts.setdefault(field_name, []).append(content)
+        except Exception:
+            pass
+    return parts
+
+def make_body(audio_size):
+    audio = os.urandom(audio_size)
+    return (
+        b'--' + BOUNDARY + b'\r\n'
+        b'Content-Disposition: form-data; name="audio"; filename="recording.webm"\r\n'
+        b'Content-Type: audio/webm\r\n\r\n' + audio + b'\r\n'
+        b'--' + BOUNDARY + b'\r\n'
+        b'Content-Disposition: form-data; name="sourceLanguage"\r\n\r\nen\r\n'
+        b'--' + BOUNDARY + b'\r\n'
+        b'Content-Disposition: form-data; name="targetLanguage"\r\n\r\nes\r\n'
+        b'--' + BOUNDARY + b'--\r\n'
+    )
+
+def measure(parser, body, audio_size, repeat=20):
+    # Peak memory allocated on top of the body itself
+    tracemalloc.start()
+    parts = parser(body, BOUNDARY)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(parts['audio'][0]) == audio_size
+    del parts
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser(body, BOUNDARY)
+    elapsed = (time.perf_counter() - start) / repeat
+    return peak, len(body) / elapsed
+
+
+if __name__ == '__main__':
+    mb = 1024 * 1024
+    print(f"{'body':>6} {'parser':>8} {'peak extra':>11} {'throughput':>12}")
+    for size in (1 * mb, 5 * mb, 10 * mb):
+        body = make_body(size)
+        for label, parser in (('legacy', legacy_parse_multipart), ('view', parse_multipart)):
+            peak, throughput = measure(parser, body, size)
+            print(f"{size // mb:>4}MB {label:>8} {peak / mb:>9.2f}MB {throughput / mb / 1024:>9.1f}GB/s")
@@ -0,0 +1,276 @@
+"""End-to-end benchmark of lambda_handler against local AWS stand-ins
+
+Each job is a multipart POST, the transcript S3 event and a final status
+check, the same sequence a real request goes through. With --direct the POST
+only asks for a presigned upload; the browser's upload to S3 is simulated and
+the input/ S3 event starts the job. The stand-ins inject
+latency (see DEFAULT_LATENCIES) and count AWS calls and bytes moved.
+
+Run from the backend directory:
+
+    python benchmarks/bench_pipeline.py                      # report
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json
+
+With --baseline the exit status is 1 when a stage's p95 latency, or the AWS
+calls or bytes per job, regressed beyond the tolerance.
+"""
+import io
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import itertools
+import contextlib
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_aws import FakeAWS, Latency
+
+import lambda_function
+import s3_keys
+
+STAGES = ('parse', 'upload', 'transcribe_start', 'translate', 'synthesize', 'post', 'upload_event', 'complete', 'status')
+
+# Median latencies in milliseconds, roughly what these calls take from Lambda
+DEFAULT_LATENCIES = {
+    's3': {
+        'put_object': Latency(20, per_kb_ms=0.02),
+        'upload_part': Latency(40, per_kb_ms=0.02),
+        'get_object': Latency(12),
+        'head_object': Latency(8),
+        '*': Latency(15)
+    },
+    'transcribe': {
+        'start_transcription_job': Latency(80),
+        'get_transcription_job': Latency(40)
+    },
+    'translate': {
+        'translate_text': Latency(60, sigma=0.3, tail_probability=0.02, tail_ms=400)
+    },
+    'polly': {
+        'synthesize_speech': Latency(150, sigma=0.3, tail_probability=0.02, tail_ms=600)
+    }
+}
+
+WEBM_MAGIC = b'\x1a\x45\xdf\xa3'
+BOUNDARY = 'benchboundary'
+
+
+def scaled_latencies(scale):
+    scaled = {}
+    for service, operations in DEFAULT_LATENCIES.items():
+        scaled[service] = {
+            operation: Latency(
+                latency.median_ms * scale, latency.sigma, latency.tail_probability,
+                latency.tail_ms * scale, latency.per_kb_ms * scale
+            )
+            for operation, latency in operations.items()
+        }
+    return scaled
+
+def multipart_event(audio, source_language, target_language):
+    body = b''.join([
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="audio"; filename="recording.webm"\r\n'.encode(),
+        b'Content-Type: audio/webm\r\n\r\n', audio, b'\r\n',
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="sourceLanguage"\r\n\r\n{source_language}\r\n'.encode(),
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="targetLanguage"\r\n\r\n{target_language}\r\n'.encode(),
+        f'--{BOUNDARY}--\r\n'.encode()
+    ])
+    return {
+        'httpMethod': 'POST',
+        'headers': {'content-type': f'multipart/form-data; boundary={BOUNDARY}'},
+        'body': base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+def upload_request_event(source_language, target_language):
+    return {
+        'httpMethod': 'POST',
+        'headers': {'content-type': 'application/json'},
+        'body': json.dumps({
+            'sourceLanguage': source_language,
+            'targetLanguage': target_language,
+            'contentType': 'audio/webm'
+        })
+    }
+
+def object_created_event(key, size=0, etag=None):
+    obj = {'key': key, 'size': size}
+    if etag:
+        obj['eTag'] = etag.strip('"')
+    return {'Records': [{'eventSource': 'aws:s3', 's3': {'object': obj}}]}
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Wraps pipeline functions and stand-in calls to time each stage"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage, fn, when=None):
+        def timed(*args, **kwargs):
+            if when is not None and not when(*args, **kwargs):
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+        return timed
+
+    def timed_call(self, stage, fn, *args):
+        return self.wrap(stage, fn)(*args)
+
+
+def run(jobs, audio_kb, scale, distinct, source_language, target_language, seed, direct=False, clips=None):
+    phrases = [f"where is the station number {i}" for i in range(distinct)]
+    spoken = itertools.count()
+    aws = FakeAWS(
+        scaled_latencies(scale),
+        seed=seed,
+        transcript_for=lambda job: phrases[next(spoken) % len(phrases)]
+    ).install()
+
+    recorder = Recorder()
+    lf = lambda_function
+    lf.streaming_transcriber = None  # measure the batch pipeline
+    lf.parse_multipart = recorder.wrap('parse', lf.parse_multipart)
+    lf.translate_text = recorder.wrap('translate', lf.translate_text)
+    lf.text_to_speech = recorder.wrap('synthesize', lf.text_to_speech)
+    aws.s3.put_object = recorder.wrap(
+        'upload', aws.s3.put_object, when=lambda **kwargs: kwargs['Key'].startswith('input/')
+    )
+    aws.transcribe.start_transcription_job = recorder.wrap('transcribe_start', aws.transcribe.start_transcription_job)
+
+    # Recordings are replayed in turn when there are fewer clips than jobs
+    noise = os.urandom(audio_kb * 1024 - len(WEBM_MAGIC) - 8)
+    recordings = [WEBM_MAGIC + i.to_bytes(8, 'big') + noise for i in range(clips or jobs)]
+    per_job = []
+    lf.fingerprint_index.hits = lf.fingerprint_index.misses = 0
+
+    for job in range(jobs):
+        audio = recordings[job % len(recordings)]
+        aws.stats.reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if direct:
+                response = recorder.timed_call('post', lf.lambda_handler, upload_request_event(source_language, target_language), None)
+                body = json.loads(response['body'])
+                job_id = body['jobId']
+
+                # The browser's upload goes straight to S3 and isn't the Lambda's work
+                input_key = body['upload']['fields']['key']
+                with aws.s3.lock:
+                    etag = aws.s3._store(input_key, audio, {})['ETag']
+                recorder.timed_call('upload_event', lf.lambda_handler, object_created_event(input_key, len(audio), etag), None)
+            else:
+                response = recorder.timed_call('post', lf.lambda_handler, multipart_event(audio, source_language, target_language), None)
+                job_id = json.loads(response['body'])['jobId']
+
+            # Replayed recordings are answered without a Transcribe job
+            job_name = s3_keys.transcription_job_name(job_id)
+            if job_name in aws.transcribe.jobs:
+                transcript_key = aws.transcribe.finish(job_name)['outputKey']
+                recorder.timed_call('complete', lf.lambda_handler, object_created_event(transcript_key), None)
+
+            # Replays sent through the API are answered in the POST response itself
+            status = response
+            if json.loads(response['body']).get('status') != 'COMPLETED':
+                status = recorder.timed_call('status', lf.check_job_status, job_id)
+        if json.loads(status['body']).get('status') != 'COMPLETED':
+            raise RuntimeError(f"Job {job_id} did not complete: {status['body']}")
+        per_job.append(aws.stats.snapshot())
+
+    report = {'jobs': jobs, 'audioKb': audio_kb, 'scale': scale, 'direct': direct, 'stages': {}}
+    for stage in STAGES:
+        samples = recorder.samples.get(stage, [])
+        report['stages'][stage] = {
+            'count': len(samples),
+            'p50': round(percentile(samples, 50) * 1000, 3),
+            'p95': round(percentile(samples, 95) * 1000, 3),
+            'p99': round(percentile(samples, 99) * 1000, 3)
+        }
+    report['awsCallsPerJob'] = round(sum(job['totalCalls'] for job in per_job) / jobs, 2)
+    report['bytesPerJob'] = round(sum(job['bytes'] for job in per_job) / jobs)
+    calls = defaultdict(int)
+    for job in per_job:
+        for operation, count in job['calls'].items():
+            calls[operation] += count
+    report['callsByOperation'] = {op: round(count / jobs, 2) for op, count in sorted(calls.items())}
+    report['fingerprintIndex'] = lf.fingerprint_index.stats()
+    return report
+
+def print_report(report):
+    mode = 'direct upload' if report.get('direct') else 'multipart POST'
+    print(f"{report['jobs']} jobs, {report['audioKb']} KB audio ({mode}), latency scale {report['scale']}")
+    print(f"{'stage':>17} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:>17} {stats['count']:>5} {stats['p50']:>9.2f} {stats['p95']:>9.2f} {stats['p99']:>9.2f}")
+    print(f"AWS calls per job: {report['awsCallsPerJob']}  bytes per job: {report['bytesPerJob']}")
+    for operation, count in report['callsByOperation'].items():
+        print(f"  {operation}: {count}")
+    if 'fingerprintIndex' in report:
+        print(f"Fingerprint index hit rate: {report['fingerprintIndex']['hitRate']}")
+
+def compare(report, baseline, tolerance):
+    """Return a list of regressions against the baseline"""
+    regressions = []
+    for stage, stats in report['stages'].items():
+        base = baseline['stages'].get(stage)
+        if not base:
+            continue
+        # Small absolute slack so sub-millisecond stages don't flap
+        limit = base['p95'] * (1 + tolerance) + 0.5
+        if stats['p95'] > limit:
+            regressions.append(f"{stage} p95 {stats['p95']:.2f} ms > {limit:.2f} ms (baseline {base['p95']:.2f})")
+    for metric in ('awsCallsPerJob', 'bytesPerJob'):
+        if report[metric] > baseline[metric] * 1.01:
+            regressions.append(f"{metric} {report[metric]} > baseline {baseline[metric]}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=50)
+    parser.add_argument('--audio-kb', type=int, default=96)
+    parser.add_argument('--scale', type=float, default=0.1, help="multiplier applied to all injected latencies")
+    parser.add_argument('--distinct', type=int, default=None, help="distinct phrases spoken (default: one per job)")
+    parser.add_argument('--source', default='es')
+    parser.add_argument('--target', default='de')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--direct', action='store_true', help="upload through a presigned POST instead of the API")
+    parser.add_argument('--clips', type=int, default=None, help="distinct recordings, replayed in turn (default: one per job)")
+    parser.add_argument('--baseline', help="compare against this baseline JSON")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative p95 regression")
+    parser.add_argument('--save-baseline', help="write this run's report as a baseline")
+    args = parser.parse_args()
+
+    report = run(
+        args.jobs, args.audio_kb, args.scale, args.distinct or args.jobs, args.source, args.target, args.seed,
+        args.direct, args.clips
+    )
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
@@ -0,0 +1,79 @@
+"""Tail latency of translate + synthesize with and without hedging and circuit breakers
+
+Each request translates a distinct sentence and synthesizes it (so nothing
+is served from the caches) against stand-ins whose Translate and Polly calls
+have an injected slow tail. In the "neural outage" scenario every neural
+Polly call also fails after its latency, as when a voice loses the engine.
+"fallback" is the plain sequential behaviour (circuits and hedging off);
+"resilient" is lambda_function's Resilience with its default settings.
+
+Run from the backend directory:
+
+    python benchmarks/bench_resilience.py [--requests N] [--concurrency N] [--tail-probability P]
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_aws import FakeAWS, Latency
+from bench_pipeline import percentile, scaled_latencies
+
+import lambda_function
+from resilience import Resilience
+from translation_routes import RouteTable
+
+
+def latencies(scale, tail_probability, tail_ms):
+    scaled = scaled_latencies(scale)
+    scaled['translate']['translate_text'] = Latency(60 * scale, 0.3, tail_probability, tail_ms * scale)
+    scaled['polly']['synthesize_speech'] = Latency(150 * scale, 0.3, tail_probability, tail_ms * scale)
+    return scaled
+
+def run(name, resilience, args, **polly_options):
+    aws = FakeAWS(latencies(args.scale, args.tail_probability, args.tail_ms), seed=args.seed, **polly_options).install()
+    lambda_function.resilience = resilience
+    lambda_function.translation_routes = RouteTable()
+
+    def request(index):
+        text = f"{name} request {index} asks about order {index * 7919 % 100000}."
+        start = time.perf_counter()
+        lambda_function.translate_and_synthesize(text, 'en', 'es')
+        return time.perf_counter() - start
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            samples = list(pool.map(request, range(args.requests)))
+    calls = aws.stats.snapshot()['calls']
+    return samples, calls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scale', type=float, default=0.5, help="multiplier applied to all injected latencies")
+    parser.add_argument('--tail-probability', type=float, default=0.05)
+    parser.add_argument('--tail-ms', type=float, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} at a time, latency scale {args.scale}, "
+          f"{args.tail_probability:.0%} of calls {args.tail_ms * args.scale:.0f} ms slower")
+    print(f"{'scenario':>14} {'mode':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'translate/req':>14} {'polly/req':>10}")
+    for scenario, polly_options in (('slow tail', {}), ('neural outage', {'failing_engines': ('neural',)})):
+        p99 = {}
+        for mode, resilience in (('fallback', Resilience(hedge_percentile=0, failure_ratio=0)),
+                                 ('resilient', Resilience())):
+            samples, calls = run(f"{scenario} {mode}", resilience, args, **polly_options)
+            p99[mode] = percentile(samples, 99)
+            print(f"{scenario:>14} {mode:>10} {percentile(samples, 50) * 1000:>8.1f} "
+                  f"{percentile(samples, 95) * 1000:>8.1f} {p99[mode] * 1000:>8.1f} "
+                  f"{calls.get('translate.translate_text', 0) / args.requests:>14.2f} "
+                  f"{calls.get('polly.synthesize_speech', 0) / args.requests:>10.2f}")
+        print(f"{scenario:>14} p99 improvement: {(1 - p99['resilient'] / p99['fallback']) * 100:.0f}%")
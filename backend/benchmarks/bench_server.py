@@ -0,0 +1,112 @@
+"""Load test of the self-hosted HTTP server at fixed client concurrency
+
+The server runs in-process against the AWS stand-ins (latency scaled by
+--scale) with an in-memory job store. Each client keeps one keep-alive
+connection and loops over a multipart POST of a distinct recording followed
+by a status check of the job it started, so every POST does the full
+upload + Transcribe start.
+
+Run from the backend directory:
+
+    python benchmarks/bench_server.py [--concurrency 1 8 32] [--seconds S] [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+import contextlib
+import http.client
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_aws import FakeAWS
+from bench_pipeline import WEBM_MAGIC, multipart_event, percentile, scaled_latencies
+
+import lambda_function
+import server
+
+
+def recording(client, index, audio_kb):
+    """Distinct audio per request, so nothing is served from the fingerprint index"""
+    tag = f"{client}-{index}".encode().ljust(16, b'.')
+    return WEBM_MAGIC + tag + b'\0' * (audio_kb * 1024 - len(WEBM_MAGIC) - len(tag))
+
+def client_loop(port, client, deadline, audio_kb, samples, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    index = 0
+    while time.time() < deadline:
+        index += 1
+        event = multipart_event(recording(client, index, audio_kb), 'en', 'es')
+        try:
+            start = time.perf_counter()
+            connection.request('POST', '/upload', base64.b64decode(event['body']), event['headers'])
+            response = connection.getresponse()
+            body = json.loads(response.read())
+            samples['post'].append(time.perf_counter() - start)
+            if response.status != 200:
+                errors.append(body.get('error'))
+                continue
+
+            start = time.perf_counter()
+            connection.request('GET', f"/upload?jobId={body['jobId']}")
+            response = connection.getresponse()
+            response.read()
+            samples['status'].append(time.perf_counter() - start)
+            if response.status != 200:
+                errors.append(response.status)
+        except Exception as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.close()
+
+def run(port, concurrency, seconds, audio_kb):
+    samples = defaultdict(list)
+    errors = []
+    deadline = time.time() + seconds
+    clients = [
+        threading.Thread(target=client_loop, args=(port, client, deadline, audio_kb, samples, errors))
+        for client in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return samples, errors, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--seconds', type=float, default=5.0, help="duration of each concurrency level")
+    parser.add_argument('--workers', type=int, default=server.SERVER_WORKERS)
+    parser.add_argument('--scale', type=float, default=0.5, help="multiplier applied to all injected latencies")
+    parser.add_argument('--audio-kb', type=int, default=64)
+    args = parser.parse_args()
+
+    FakeAWS(scaled_latencies(args.scale)).install()
+    lambda_function.job_store = lambda_function.InMemoryJobStore(lambda_function.JOB_TTL_SECONDS)
+    lambda_function.streaming_transcriber = None  # every POST starts a batch job
+
+    httpd = server.make_server('127.0.0.1', 0, args.workers)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    print(f"{args.workers} workers, latency scale {args.scale}, {args.audio_kb} KB uploads, {args.seconds:g} s per level")
+    print(f"{'clients':>7} {'requests':>9} {'req/s':>8} {'post p50':>9} {'post p95':>9} {'status p50':>11} {'status p95':>11} {'errors':>7}")
+    for concurrency in args.concurrency:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            samples, errors, elapsed = run(port, concurrency, args.seconds, args.audio_kb)
+        requests = len(samples['post']) + len(samples['status'])
+        print(f"{concurrency:>7} {requests:>9} {requests / elapsed:>8.1f} "
+              f"{percentile(samples['post'], 50) * 1000:>9.1f} {percentile(samples['post'], 95) * 1000:>9.1f} "
+              f"{percentile(samples['status'], 50) * 1000:>11.1f} {percentile(samples['status'], 95) * 1000:>11.1f} "
+              f"{len(errors):>7}")
+
+    httpd.shutdown()
+    httpd.server_close()
@@ -0,0 +1,93 @@
+"""Total and time-to-first-audio latency of chunked versus single-call synthesis
+
+text_to_speech runs against the Polly/S3 stand-ins, whose synthesis time
+grows with the text length. "single" sends the whole text in one request (as
+before chunking); "chunked" uses SPEECH_CHUNK_CHARS. First audio is when a
+playable object is first in S3: the first chunk, or the whole clip for single.
+
+Run from the backend directory:
+
+    python benchmarks/bench_speech_chunks.py [--runs N] [--scale S]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_aws import FakeAWS, Latency
+
+import lambda_function
+
+LENGTHS = (400, 1500, 2900, 6000, 12000)
+
+# Polly neural takes roughly 150 ms plus ~1 ms per character; the stand-in
+# produces 400 bytes per character, so express the per-character cost per KB
+POLLY_MEDIAN_MS = 150
+POLLY_MS_PER_CHAR = 1.0
+BYTES_PER_CHAR = 400
+
+
+def latencies(scale):
+    return {
+        'polly': {'synthesize_speech': Latency(
+            POLLY_MEDIAN_MS * scale, sigma=0.2, per_kb_ms=POLLY_MS_PER_CHAR * 1024.0 / BYTES_PER_CHAR * scale
+        )},
+        's3': {
+            'put_object': Latency(20 * scale, per_kb_ms=0.02 * scale),
+            'upload_part': Latency(40 * scale, per_kb_ms=0.02 * scale),
+            '*': Latency(10 * scale)
+        }
+    }
+
+def sample_text(length, run):
+    """Distinct text per run so nothing is served from the speech cache"""
+    sentences = []
+    i = 0
+    while sum(len(s) + 1 for s in sentences) < length:
+        sentences.append(f"Run {run} sentence {i} talks about the weather near the old station.")
+        i += 1
+    return ' '.join(sentences)[:length]
+
+def measure(text, chunk_chars):
+    lambda_function.SPEECH_CHUNK_CHARS = chunk_chars
+    first = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        lambda_function.text_to_speech(text, 'de', lambda_function.INPUT_BUCKET, lambda key: first.append(time.perf_counter()))
+    total = time.perf_counter() - start
+    return total, (first[0] - start) if first else total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=0.2, help="multiplier applied to all injected latencies")
+    args = parser.parse_args()
+
+    FakeAWS(latencies(args.scale), bytes_per_char=BYTES_PER_CHAR).install()
+    chunk_chars = lambda_function.SPEECH_CHUNK_CHARS
+
+    print(f"latency scale {args.scale}, {args.runs} runs, chunks of {chunk_chars} chars; median ms")
+    print(f"{'chars':>6} {'single total':>13} {'chunked total':>14} {'single first':>13} {'chunked first':>14}")
+    run = 0
+    for length in LENGTHS:
+        rows = {'single': [], 'chunked': []}
+        for _ in range(args.runs):
+            run += 1
+            for mode, chars in (('single', 10 ** 9), ('chunked', chunk_chars)):
+                try:
+                    rows[mode].append(measure(sample_text(length, f"{mode}{run}"), chars))
+                except Exception:
+                    pass  # over Polly's limit in one request
+
+        def cell(mode, index):
+            if not rows[mode]:
+                return 'rejected'
+            return f"{statistics.median(sample[index] for sample in rows[mode]) * 1000:.0f}"
+
+        print(f"{length:>6} {cell('single', 0):>13} {cell('chunked', 0):>14} {cell('single', 1):>13} {cell('chunked', 1):>14}")
@@ -0,0 +1,83 @@
+"""Peak memory of streaming Polly audio into S3 versus buffering it
+
+Run from the backend directory:
+
+    python benchmarks/bench_stream_upload.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from s3_upload import upload_stream
+
+
+class FakeAudioStream:
+    """Polly-like AudioStream producing size bytes in small reads"""
+
+    def __init__(self, size, read_size=16 * 1024):
+        self.remaining = size
+        self.read_size = read_size
+
+    def read(self, amt=None):
+        if amt is None:
+            n = self.remaining
+        else:
+            n = min(amt, self.read_size, self.remaining)
+        self.remaining -= n
+        return b'\xff' * n
+
+    def close(self):
+        pass
+
+
+class CountingS3:
+    """Discards uploaded bodies, only counting bytes"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def put_object(self, Body, **kwargs):
+        self.bytes += len(Body)
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        self.bytes += len(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+def measure(fn, size):
+    s3 = CountingS3()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(s3, FakeAudioStream(size))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert s3.bytes == size
+    return peak, elapsed
+
+def buffered(s3, stream):
+    s3.put_object(Bucket='bench', Key='out.mp3', Body=stream.read())
+
+def streamed(s3, stream):
+    upload_stream(s3, stream, 'bench', 'out.mp3', 'audio/mpeg')
+
+
+if __name__ == '__main__':
+    mb = 1024 * 1024
+    print(f"{'size':>8} {'buffered peak':>14} {'streamed peak':>14} {'streamed time':>14}")
+    for size in (1 * mb, 8 * mb, 32 * mb, 128 * mb):
+        buffered_peak, _ = measure(buffered, size)
+        streamed_peak, streamed_time = measure(streamed, size)
+        print(f"{size // mb:>6}MB {buffered_peak / mb:>12.1f}MB {streamed_peak / mb:>12.1f}MB {streamed_time:>13.3f}s")
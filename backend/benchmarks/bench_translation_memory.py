@@ -0,0 +1,83 @@
+"""Characters sent to Translate with whole-text caching versus the sentence memory
+
+Utterances are built like support calls: a few sentences drawn from a fixed
+script, where most sentences recur verbatim but whole utterances rarely do.
+"whole text" caches each utterance as one entry (as before the translation
+memory); "sentences" is lambda_function's TranslationMemory.
+
+Run from the backend directory:
+
+    python benchmarks/bench_translation_memory.py [--utterances N] [--script N]
+"""
+import io
+import os
+import sys
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from translation_cache import TranslationCache, TranslationMemory
+
+
+def script_sentences(count):
+    return [f"Script line {i} explains step {i % 7} of the returns process." for i in range(count)]
+
+def utterances(count, script, rng, novel_probability=0.2):
+    """2-5 sentences each: mostly script lines, sometimes a sentence never heard before"""
+    result = []
+    for i in range(count):
+        sentences = []
+        for j in range(rng.randint(2, 5)):
+            if rng.random() < novel_probability:
+                sentences.append(f"Caller {i} asks about order number {rng.randint(10000, 99999)}.")
+            else:
+                sentences.append(rng.choice(script))
+        result.append(' '.join(sentences))
+    return result
+
+def whole_text(cache):
+    """Translate function that caches each text as one entry"""
+    def translate(text, source_language, target_language, translate_fn):
+        value = cache.get(text, source_language, target_language)
+        if value is None:
+            value = translate_fn(text, source_language, target_language)
+            cache.put(text, source_language, target_language, value)
+        return value
+    return translate
+
+def measure(texts, translate):
+    sent = {'calls': 0, 'chars': 0}
+
+    def fake_translate(text, source_language, target_language):
+        sent['calls'] += 1
+        sent['chars'] += len(text)
+        return '\n'.join(f"<{line}>" for line in text.split('\n'))
+
+    for text in texts:
+        translate(text, 'en', 'de', fake_translate)
+    return sent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=2000)
+    parser.add_argument('--script', type=int, default=60, help="distinct script sentences")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = utterances(args.utterances, script_sentences(args.script), random.Random(args.seed))
+    total = sum(len(text) for text in texts)
+
+    whole = TranslationCache(maxsize=10000)
+    memory = TranslationMemory(TranslationCache(maxsize=10000))
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = [('whole text', measure(texts, whole_text(whole)), whole.stats()['hitRate']),
+                ('sentences', measure(texts, memory.translate), memory.stats()['sentenceHitRate'])]
+
+    print(f"{args.utterances} utterances, {total} characters, {args.script} script sentences")
+    print(f"{'cache':>11} {'hit rate':>9} {'calls':>7} {'chars billed':>13} {'billed %':>9}")
+    for name, sent, hit_rate in rows:
+        print(f"{name:>11} {hit_rate:>9.3f} {sent['calls']:>7} {sent['chars']:>13} {sent['chars'] / total * 100:>8.1f}%")
+    print(f"sentence memory: {memory.stats()}")
@@ -0,0 +1,364 @@
+"""In-process stand-ins for S3, Transcribe, Translate and Polly
+
+They implement just the calls lambda_function makes, add latency drawn from a
+configurable distribution, and count calls and bytes moved. install() points
+every aws_clients.LazyClient at them, so no boto3 or AWS account is needed.
+"""
+import io
+import json
+import time
+import random
+import hashlib
+import datetime
+import threading
+from collections import defaultdict
+
+import aws_clients
+
+
+class ClientError(Exception):
+    def __init__(self, code, message=''):
+        super().__init__(f"{code}: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class NoSuchKey(ClientError):
+    def __init__(self, key):
+        super().__init__('NoSuchKey', key)
+
+
+class ConditionalCheckFailedException(ClientError):
+    def __init__(self):
+        super().__init__('ConditionalCheckFailedException')
+
+
+class Latency:
+    """Log-normal latency with the given median (ms), plus a slow tail"""
+
+    def __init__(self, median_ms=0.0, sigma=0.25, tail_probability=0.0, tail_ms=0.0, per_kb_ms=0.0):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.tail_probability = tail_probability
+        self.tail_ms = tail_ms
+        self.per_kb_ms = per_kb_ms
+
+    def sample(self, rng, size=0):
+        if self.median_ms <= 0 and self.per_kb_ms <= 0:
+            return 0.0
+        ms = self.median_ms * rng.lognormvariate(0, self.sigma) if self.median_ms > 0 else 0.0
+        ms += self.per_kb_ms * size / 1024.0
+        if self.tail_probability and rng.random() < self.tail_probability:
+            ms += self.tail_ms
+        return ms / 1000.0
+
+
+class Stats:
+    """Call and byte counters shared by all stand-ins"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = defaultdict(int)
+            self.bytes = 0
+
+    def record(self, operation, size=0):
+        with self.lock:
+            self.calls[operation] += 1
+            self.bytes += size
+
+    def snapshot(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'totalCalls': sum(self.calls.values()), 'bytes': self.bytes}
+
+
+class FakeService:
+    def __init__(self, stats, latencies=None, seed=0):
+        self.stats = stats
+        self.latencies = latencies or {}
+        # operation -> probability that a call fails (after its latency)
+        self.faults = {}
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+    def _delay(self, operation, size=0):
+        latency = self.latencies.get(operation) or self.latencies.get('*')
+        if latency is not None:
+            with self.rng_lock:
+                seconds = latency.sample(self.rng, size)
+            if seconds:
+                time.sleep(seconds)
+
+    def _call(self, operation, size=0):
+        self.stats.record(f"{self.service}.{operation}", size)
+        self._delay(operation, size)
+        probability = self.faults.get(operation, 0.0)
+        if probability:
+            with self.rng_lock:
+                failed = self.rng.random() < probability
+            if failed:
+                raise ClientError('ServiceUnavailableException', f"injected {self.service}.{operation} failure")
+
+
+def _body_bytes(body):
+    if hasattr(body, 'read'):
+        body = body.read()
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return bytes(body)
+
+
+class FakePaginator:
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def paginate(self, Bucket, Prefix='', **kwargs):
+        response = self.s3.list_objects_v2(Bucket=Bucket, Prefix=Prefix, **kwargs)
+        yield response
+
+
+class FakeS3(FakeService):
+    service = 's3'
+
+    class exceptions:
+        ClientError = ClientError
+        NoSuchKey = NoSuchKey
+
+    def __init__(self, stats, latencies=None, seed=0):
+        super().__init__(stats, latencies, seed)
+        self.objects = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        data = _body_bytes(Body)
+        self._call('put_object', len(data))
+        with self.lock:
+            existing = self.objects.get(Key)
+            if 'IfNoneMatch' in kwargs and existing is not None:
+                raise ClientError('PreconditionFailed')
+            if 'IfMatch' in kwargs and (existing is None or existing['ETag'] != kwargs['IfMatch']):
+                raise ClientError('PreconditionFailed')
+            return self._store(Key, data, kwargs)
+
+    def _store(self, key, data, kwargs):
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        self.objects[key] = {
+            'Body': data,
+            'ETag': etag,
+            'Metadata': kwargs.get('Metadata', {}),
+            'ContentType': kwargs.get('ContentType', 'binary/octet-stream'),
+            'LastModified': datetime.datetime.now(datetime.timezone.utc)
+        }
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self.lock:
+            obj = self.objects.get(Key)
+        if obj is None:
+            self._call('get_object')
+            raise NoSuchKey(Key)
+        self._call('get_object', len(obj['Body']))
+        return dict(obj, Body=io.BytesIO(obj['Body']), ContentLength=len(obj['Body']))
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._call('head_object')
+        with self.lock:
+            obj = self.objects.get(Key)
+        if obj is None:
+            raise ClientError('404', 'Not Found')
+        return {'ContentLength': len(obj['Body']), 'ETag': obj['ETag'], 'Metadata': obj['Metadata']}
+
+    def delete_objects(self, Bucket, Delete):
+        self._call('delete_objects')
+        with self.lock:
+            for item in Delete['Objects']:
+                self.objects.pop(item['Key'], None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, **kwargs):
+        self._call('list_objects_v2')
+        contents = []
+        common_prefixes = []
+        with self.lock:
+            for key, obj in sorted(self.objects.items()):
+                if not key.startswith(Prefix):
+                    continue
+                if Delimiter and Delimiter in key[len(Prefix):]:
+                    common = key[:key.index(Delimiter, len(Prefix)) + len(Delimiter)]
+                    if not common_prefixes or common_prefixes[-1] != common:
+                        common_prefixes.append(common)
+                    continue
+                contents.append({'Key': key, 'LastModified': obj['LastModified'], 'Size': len(obj['Body'])})
+        response = {'Contents': contents, 'KeyCount': len(contents) + len(common_prefixes)}
+        if common_prefixes:
+            response['CommonPrefixes'] = [{'Prefix': common} for common in common_prefixes]
+        return response
+
+    def get_paginator(self, operation):
+        return FakePaginator(self)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call('create_multipart_upload')
+        upload_id = hashlib.md5(f"{Key}{time.time()}".encode()).hexdigest()
+        with self.lock:
+            self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        data = _body_bytes(Body)
+        self._call('upload_part', len(data))
+        with self.lock:
+            self.uploads[UploadId][PartNumber] = data
+        return {'ETag': '"%s"' % hashlib.md5(data).hexdigest()}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call('complete_multipart_upload')
+        with self.lock:
+            parts = self.uploads.pop(UploadId)
+            data = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+            return self._store(Key, data, kwargs)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._call('abort_multipart_upload')
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        # Presigning is local in botocore, so it is not counted as a call
+        return f"https://fake-s3.local/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        return {'url': f"https://fake-s3.local/{Bucket}", 'fields': dict(Fields or {}, key=Key)}
+
+
+class FakeTranscribe(FakeService):
+    """Jobs complete after a sampled duration; the transcript is written to FakeS3"""
+
+    service = 'transcribe'
+
+    def __init__(self, stats, s3, latencies=None, seed=0, transcript_for=None, job_duration=None):
+        super().__init__(stats, latencies, seed)
+        self.s3 = s3
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.transcript_for = transcript_for or (lambda job: 'hello world')
+        self.job_duration = job_duration or Latency(0)
+
+    def start_transcription_job(self, TranscriptionJobName, Media, OutputKey=None, **kwargs):
+        self._call('start_transcription_job')
+        with self.rng_lock:
+            duration = self.job_duration.sample(self.rng)
+        with self.lock:
+            self.jobs[TranscriptionJobName] = {
+                'name': TranscriptionJobName,
+                'media': Media['MediaFileUri'],
+                'outputKey': OutputKey or f"{TranscriptionJobName}.json",
+                'createdAt': time.time(),
+                'readyAt': time.time() + duration,
+                'status': 'IN_PROGRESS',
+                'kwargs': kwargs
+            }
+        return {'TranscriptionJob': {'TranscriptionJobName': TranscriptionJobName}}
+
+    def finish(self, job_name, status='COMPLETED'):
+        """Complete a job now and write its transcript, as Transcribe would"""
+        with self.lock:
+            job = self.jobs[job_name]
+            job['status'] = status
+            job['completedAt'] = time.time()
+        if status == 'COMPLETED':
+            transcript = {'results': {'transcripts': [{'transcript': self.transcript_for(job)}]}}
+            # Written by the service, not by the Lambda
+            with self.s3.lock:
+                self.s3._store(job['outputKey'], json.dumps(transcript).encode('utf-8'), {})
+        return job
+
+    def get_transcription_job(self, TranscriptionJobName):
+        self._call('get_transcription_job')
+        with self.lock:
+            job = self.jobs[TranscriptionJobName]
+            ready = job['status'] == 'IN_PROGRESS' and time.time() >= job['readyAt']
+        if ready:
+            job = self.finish(TranscriptionJobName)
+        response = {
+            'TranscriptionJobName': TranscriptionJobName,
+            'TranscriptionJobStatus': job['status'],
+            'CreationTime': datetime.datetime.fromtimestamp(job['createdAt'], datetime.timezone.utc)
+        }
+        if 'completedAt' in job:
+            response['CompletionTime'] = datetime.datetime.fromtimestamp(job['completedAt'], datetime.timezone.utc)
+        return {'TranscriptionJob': response}
+
+
+class FakeTranslate(FakeService):
+    service = 'translate'
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode, **kwargs):
+        size = len(Text.encode('utf-8'))
+        self._call('translate_text', size)
+        return {
+            # Line by line, as Translate keeps the line breaks of its input
+            'TranslatedText': '\n'.join(f"[{TargetLanguageCode}] {line}" for line in Text.split('\n')),
+            'SourceLanguageCode': 'en' if SourceLanguageCode == 'auto' else SourceLanguageCode,
+            'TargetLanguageCode': TargetLanguageCode
+        }
+
+
+class FakeAudioStream(io.BytesIO):
+    pass
+
+
+class FakePolly(FakeService):
+    """Produces ~bytes_per_char bytes of fake MP3 per input character
+
+    Like Polly, requests with more than max_chars characters are rejected.
+    """
+
+    service = 'polly'
+
+    def __init__(self, stats, latencies=None, seed=0, bytes_per_char=400, failing_engines=(), max_chars=3000):
+        super().__init__(stats, latencies, seed)
+        self.bytes_per_char = bytes_per_char
+        self.failing_engines = set(failing_engines)
+        self.max_chars = max_chars
+
+    def synthesize_speech(self, Text, OutputFormat, VoiceId, Engine='standard', **kwargs):
+        if len(Text) > self.max_chars:
+            self._call('synthesize_speech')
+            raise ClientError('TextLengthExceededException', f"{len(Text)} characters exceed {self.max_chars}")
+        audio = b'\xff\xfb' + b'\x00' * max(0, len(Text) * self.bytes_per_char - 2)
+        self._call('synthesize_speech', len(audio))
+        if Engine in self.failing_engines:
+            raise ClientError('EngineNotSupportedException', f"{VoiceId} does not support {Engine}")
+        content_type = {'mp3': 'audio/mpeg', 'ogg_vorbis': 'audio/ogg', 'pcm': 'audio/pcm'}.get(OutputFormat)
+        return {'AudioStream': FakeAudioStream(audio), 'ContentType': content_type}
+
+
+class FakeAWS:
+    """A full set of stand-ins sharing one Stats"""
+
+    def __init__(self, latencies=None, seed=0, transcript_for=None, job_duration=None, faults=None, **polly_options):
+        latencies = latencies or {}
+        self.stats = Stats()
+        self.s3 = FakeS3(self.stats, latencies.get('s3'), seed)
+        self.transcribe = FakeTranscribe(
+            self.stats, self.s3, latencies.get('transcribe'), seed + 1, transcript_for, job_duration
+        )
+        self.translate = FakeTranslate(self.stats, latencies.get('translate'), seed + 2)
+        self.polly = FakePolly(self.stats, latencies.get('polly'), seed + 3, **polly_options)
+        # e.g. {'translate': {'translate_text': 0.05}}
+        for name, service_faults in (faults or {}).items():
+            getattr(self, name).faults = dict(service_faults)
+
+    def install(self):
+        """Make every LazyClient resolve to these stand-ins"""
+        aws_clients._clients.update({
+            's3': self.s3,
+            'transcribe': self.transcribe,
+            'translate': self.translate,
+            'polly': self.polly
+        })
+        return self
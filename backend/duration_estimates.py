@@ -0,0 +1,79 @@
+import time
+import threading
+
+# Until a language and format has MIN_SAMPLES of history, Transcribe is
+# assumed to take this long to start plus this much per MB of audio
+DEFAULT_OVERHEAD_SECONDS = 10.0
+DEFAULT_SECONDS_PER_MB = 30.0
+MIN_SAMPLES = 5
+
+MIN_ESTIMATE_SECONDS = 2.0
+
+
+def fit_duration(samples):
+    """Least-squares fit of seconds = overhead + per_mb * MB over [bytes, seconds] samples
+
+    Returns (overhead, per_mb). When the uploads are all about the same size
+    the slope can't be fitted, so the default per-MB cost is kept and only the
+    overhead is taken from the history.
+    """
+    sizes = [size / 1e6 for size, _ in samples]
+    seconds = [duration for _, duration in samples]
+    mean_size = sum(sizes) / len(sizes)
+    mean_seconds = sum(seconds) / len(seconds)
+
+    variance = sum((size - mean_size) ** 2 for size in sizes)
+    per_mb = DEFAULT_SECONDS_PER_MB
+    if variance > 1e-6 * len(sizes):
+        covariance = sum((size - mean_size) * (duration - mean_seconds) for size, duration in zip(sizes, seconds))
+        per_mb = max(0.0, covariance / variance)
+    return max(0.0, mean_seconds - per_mb * mean_size), per_mb
+
+
+class DurationEstimator:
+    """Predicts how long Transcribe will take for an upload from recent jobs
+
+    A rolling window of (upload bytes, seconds until the transcript arrived)
+    is stored under "{language}/{media format}". Histories are cached in
+    memory and re-read after refresh_seconds; concurrent containers may
+    overwrite each other's newest samples, which a rolling estimate tolerates.
+    """
+
+    def __init__(self, backend, window=50, refresh_seconds=300):
+        self.backend = backend
+        self.window = window
+        self.refresh_seconds = refresh_seconds
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    def history(self, language_code, media_format):
+        """Recent [bytes, seconds] samples, oldest first"""
+        key = f"{language_code}/{media_format}"
+        with self._lock:
+            cached = self._histories.get(key)
+        if cached is not None and time.time() - cached[0] < self.refresh_seconds:
+            return cached[1]
+
+        samples = self.backend.get(key) or []
+        with self._lock:
+            self._histories[key] = (time.time(), samples)
+        return samples
+
+    def record(self, language_code, media_format, audio_bytes, seconds):
+        """Add one finished transcription to the language's history"""
+        if not audio_bytes or seconds <= 0:
+            return
+        samples = self.history(language_code, media_format) + [[int(audio_bytes), round(seconds, 3)]]
+        samples = samples[-self.window:]
+        with self._lock:
+            self._histories[f"{language_code}/{media_format}"] = (time.time(), samples)
+        self.backend.put(f"{language_code}/{media_format}", samples)
+
+    def estimate(self, language_code, media_format, audio_bytes):
+        """Expected seconds from starting the transcription job to its transcript"""
+        samples = self.history(language_code, media_format)
+        if len(samples) >= MIN_SAMPLES:
+            overhead, per_mb = fit_duration(samples)
+        else:
+            overhead, per_mb = DEFAULT_OVERHEAD_SECONDS, DEFAULT_SECONDS_PER_MB
+        return max(MIN_ESTIMATE_SECONDS, overhead + per_mb * (audio_bytes or 0) / 1e6)
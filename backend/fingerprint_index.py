@@ -0,0 +1,51 @@
+import hashlib
+import threading
+
+
+def fingerprint(audio):
+    """Content hash identifying byte-identical uploads"""
+    return 'sha256-' + hashlib.sha256(audio).hexdigest()
+
+def etag_fingerprint(etag):
+    """Fingerprint from an S3 ETag, for uploads the function never reads
+
+    Presigned POST uploads are single-part, so their ETag is the MD5 of the
+    content.
+    """
+    return 'etag-' + etag.strip('"')
+
+
+class FingerprintIndex:
+    """Maps audio fingerprints to the transcript Transcribe produced for them
+
+    Entries are keyed "{language}/{fingerprint}", since the same audio
+    transcribes differently in another Transcribe language, and live as long
+    as the backend keeps them.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, audio_fingerprint, language_code):
+        """Return the known transcript for this audio, or None"""
+        transcript = self.backend.get(f"{language_code}/{audio_fingerprint}")
+        with self._lock:
+            if transcript is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return transcript
+
+    def record(self, audio_fingerprint, language_code, transcript):
+        self.backend.put(f"{language_code}/{audio_fingerprint}", transcript)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,314 @@
+import json
+import time
+import threading
+from decimal import Decimal
+
+# Job statuses no lease can be taken on
+FINISHED = ('COMPLETED', 'FAILED')
+
+
+class ConditionFailed(Exception):
+    """A conditional job update found the record in an unexpected state"""
+
+
+def conditions_hold(record, condition):
+    """Check {field: expected} against a record; an expected None means the field is unset"""
+    for field, expected in (condition or {}).items():
+        if record.get(field) != expected:
+            return False
+    return True
+
+
+class JobStore:
+    """Job records keyed by jobId, with conditional partial updates and TTL expiry
+
+    Every record carries a `version` that each update increments, so callers
+    can do optimistic read-modify-write with modify().
+    """
+
+    def __init__(self, ttl_seconds=24 * 3600):
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, job_id):
+        """Return the job record, or None if it doesn't exist or has expired"""
+        raise NotImplementedError
+
+    def create(self, record):
+        """Store a new record; raises ConditionFailed if the job already exists"""
+        raise NotImplementedError
+
+    def update(self, job_id, changes, condition=None):
+        """Set the given fields if condition holds and return the updated record"""
+        raise NotImplementedError
+
+    def modify(self, job_id, mutate, retries=5):
+        """Apply mutate(record) -> changes atomically, retrying on concurrent updates
+
+        mutate returns the fields to change, or None to leave the record alone.
+        Returns the resulting record, or None if the job doesn't exist.
+        """
+        for _ in range(retries):
+            record = self.get(job_id)
+            if record is None:
+                return None
+            changes = mutate(record)
+            if not changes:
+                return record
+            try:
+                return self.update(job_id, changes, {'version': record.get('version', 0)})
+            except ConditionFailed:
+                continue
+        raise ConditionFailed(f"Too many concurrent updates to job {job_id}")
+
+    def acquire_lease(self, job_id, name, owner, lease_seconds):
+        """Claim the lease `name` on a job for owner, so only one invocation does the work it guards
+
+        Returns the job record when the lease was acquired, or None when another
+        owner holds an unexpired lease or the job is completed, failed or gone. Expired
+        leases are taken over, so work abandoned by a crashed invocation is
+        picked up again.
+        """
+        def mutate(record):
+            if record.get('status') in FINISHED:
+                return None
+            leases = dict(record.get('leases') or {})
+            lease = leases.get(name)
+            if lease and lease['owner'] != owner and lease['expires'] > time.time():
+                return None
+            if lease and lease['owner'] != owner:
+                print(f"Taking over expired {name} lease on job {job_id} from {lease['owner']}")
+            leases[name] = {'owner': owner, 'expires': time.time() + lease_seconds}
+            return {'leases': leases}
+
+        record = self.modify(job_id, mutate)
+        lease = ((record or {}).get('leases') or {}).get(name)
+        if lease is None or lease['owner'] != owner or record.get('status') in FINISHED:
+            return None
+        return record
+
+    def release_lease(self, job_id, name, owner):
+        """Give up a lease early, e.g. after the guarded work failed, so others can retry at once"""
+        def mutate(record):
+            leases = dict(record.get('leases') or {})
+            if (leases.get(name) or {}).get('owner') != owner:
+                return None
+            del leases[name]
+            return {'leases': leases}
+
+        self.modify(job_id, mutate)
+
+    def _new_record(self, record):
+        record = dict(record)
+        record['version'] = 1
+        record['expiresAt'] = int(time.time() + self.ttl_seconds)
+        return record
+
+    @staticmethod
+    def _expired(record):
+        return record.get('expiresAt', float('inf')) < time.time()
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store for tests and local runs"""
+
+    def __init__(self, ttl_seconds=24 * 3600):
+        super().__init__(ttl_seconds)
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None or self._expired(record):
+                self._records.pop(job_id, None)
+                return None
+            return json.loads(json.dumps(record))
+
+    def create(self, record):
+        with self._lock:
+            existing = self._records.get(record['jobId'])
+            if existing is not None and not self._expired(existing):
+                raise ConditionFailed(f"Job {record['jobId']} already exists")
+            record = self._new_record(record)
+            self._records[record['jobId']] = record
+            return json.loads(json.dumps(record))
+
+    def update(self, job_id, changes, condition=None):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None or self._expired(record) or not conditions_hold(record, condition):
+                raise ConditionFailed(f"Condition failed for job {job_id}")
+            record.update(json.loads(json.dumps(changes)))
+            record['version'] = record.get('version', 0) + 1
+            return json.loads(json.dumps(record))
+
+
+class DynamoDBJobStore(JobStore):
+    """DynamoDB table with partition key `jobId` and TTL enabled on `expiresAt`
+
+    Updates are single UpdateItem calls with a ConditionExpression, so
+    concurrent writers never overwrite each other.
+    """
+
+    def __init__(self, dynamodb, table_name, ttl_seconds=24 * 3600):
+        super().__init__(ttl_seconds)
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+
+    def _dump(self, value):
+        from boto3.dynamodb.types import TypeSerializer
+
+        # DynamoDB numbers must be Decimals
+        return TypeSerializer().serialize(json.loads(json.dumps(value), parse_float=Decimal))
+
+    def _load(self, item):
+        from boto3.dynamodb.types import TypeDeserializer
+
+        deserializer = TypeDeserializer()
+        record = {key: deserializer.deserialize(value) for key, value in item.items()}
+        return json.loads(json.dumps(record, default=lambda d: int(d) if d == d.to_integral_value() else float(d)))
+
+    def get(self, job_id):
+        response = self.dynamodb.get_item(
+            TableName=self.table_name,
+            Key={'jobId': {'S': job_id}},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        if item is None:
+            return None
+        record = self._load(item)
+        # TTL deletion can lag behind expiry by hours
+        return None if self._expired(record) else record
+
+    def create(self, record):
+        record = self._new_record(record)
+        try:
+            self.dynamodb.put_item(
+                TableName=self.table_name,
+                Item={key: self._dump(value) for key, value in record.items()},
+                ConditionExpression='attribute_not_exists(jobId)'
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            raise ConditionFailed(f"Job {record['jobId']} already exists")
+        return record
+
+    def update(self, job_id, changes, condition=None):
+        names = {'#version': 'version'}
+        values = {':one': {'N': '1'}, ':zero': {'N': '0'}}
+        assignments = ['#version = if_not_exists(#version, :zero) + :one']
+        for i, (field, value) in enumerate(changes.items()):
+            names[f'#f{i}'] = field
+            values[f':f{i}'] = self._dump(value)
+            assignments.append(f'#f{i} = :f{i}')
+
+        checks = ['attribute_exists(jobId)']
+        for i, (field, expected) in enumerate((condition or {}).items()):
+            names[f'#c{i}'] = field
+            if expected is None:
+                checks.append(f'(attribute_not_exists(#c{i}) OR attribute_type(#c{i}, :null))')
+                values[':null'] = {'S': 'NULL'}
+            else:
+                values[f':c{i}'] = self._dump(expected)
+                checks.append(f'#c{i} = :c{i}')
+
+        try:
+            response = self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key={'jobId': {'S': job_id}},
+                UpdateExpression='SET ' + ', '.join(assignments),
+                ConditionExpression=' AND '.join(checks),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW'
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            raise ConditionFailed(f"Condition failed for job {job_id}")
+        return self._load(response['Attributes'])
+
+
+class S3JobStore(JobStore):
+    """One S3 object per job, made safe with S3 conditional writes
+
+    Records go to key_for(job_id) when given (e.g. s3_keys.job_key), or to the
+    original {prefix}{id}.json layout. Updates re-read the object and write it
+    back with If-Match on its ETag, retrying when another writer got there
+    first.
+    """
+
+    def __init__(self, s3, bucket, prefix='jobs/', ttl_seconds=24 * 3600, retries=5, key_for=None):
+        super().__init__(ttl_seconds)
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.retries = retries
+        self.key_for = key_for
+
+    def _key(self, job_id):
+        if self.key_for is not None:
+            return self.key_for(job_id)
+        return f"{self.prefix}{job_id}.json"
+
+    def _read(self, job_id):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(job_id))
+        except self.s3.exceptions.NoSuchKey:
+            return None, None
+        return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
+
+    def _write(self, record, **conditions):
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self._key(record['jobId']),
+                Body=json.dumps(record),
+                ContentType='application/json',
+                **conditions
+            )
+        except self.s3.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                return False
+            raise
+        return True
+
+    def get(self, job_id):
+        record, _ = self._read(job_id)
+        if record is None or self._expired(record):
+            return None
+        return record
+
+    def create(self, record):
+        record = self._new_record(record)
+        if not self._write(record, IfNoneMatch='*'):
+            raise ConditionFailed(f"Job {record['jobId']} already exists")
+        return record
+
+    def update(self, job_id, changes, condition=None):
+        for _ in range(self.retries):
+            record, etag = self._read(job_id)
+            if record is None or self._expired(record) or not conditions_hold(record, condition):
+                raise ConditionFailed(f"Condition failed for job {job_id}")
+            updated = self._update(record, etag, changes)
+            if updated is not None:
+                return updated
+        raise ConditionFailed(f"Too many concurrent updates to job {job_id}")
+
+    def modify(self, job_id, mutate, retries=5):
+        # The ETag of the read that mutate saw guards the write, so each attempt is one GET and one PUT
+        for _ in range(retries):
+            record, etag = self._read(job_id)
+            if record is None or self._expired(record):
+                return None
+            changes = mutate(record)
+            if not changes:
+                return record
+            updated = self._update(record, etag, changes)
+            if updated is not None:
+                return updated
+        raise ConditionFailed(f"Too many concurrent updates to job {job_id}")
+
+    def _update(self, record, etag, changes):
+        """Write record with changes applied if its object still has etag; None if it changed since"""
+        record = dict(record, **changes)
+        record['version'] = record.get('version', 0) + 1
+        return record if self._write(record, IfMatch=etag) else None
@@ -1,20 +1,239 @@
+import io
 import json
 import os
 import base64
+import contextlib
 import uuid
 import time
-import boto3
-from urllib.parse import parse_qs
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote_plus
 
-# Initialize AWS clients
-s3 = boto3.client('s3')
-transcribe = boto3.client('transcribe')
-translate = boto3.client('translate')
-polly = boto3.client('polly')
+import audio_preprocess
+import s3_keys
+from aws_clients import LazyClient, warm_up
+from duration_estimates import DurationEstimator
+from fingerprint_index import FingerprintIndex, etag_fingerprint, fingerprint
+from job_store import ConditionFailed, DynamoDBJobStore, InMemoryJobStore, S3JobStore
+from metrics import Metrics, redact_event
+from multipart import MultipartError, ViewReader, parse_header_params, parse_multipart
+from resilience import Resilience, size_class
+from s3_upload import ConcatenatedStream, upload_stream
+from streaming_transcriber import (
+    BATCH_MEDIA_FORMATS, FILE_EXTENSIONS, audio_duration, default_transcriber, detect_media_format
+)
+from sweeper import Sweeper
+from text_chunks import chunk_text
+from translation_cache import MemoryCacheBackend, S3CacheBackend, TranslationCache, TranslationMemory
+from translation_routes import RouteTable, PIVOT as ROUTE_PIVOT, AUTO as ROUTE_AUTO
+
+# Per-invocation stage timings, logged in CloudWatch embedded metric format
+metrics = Metrics()
+
+# AWS clients are created on first use from one shared session and reused
+# across warm invocations, so a request only pays for the services it touches.
+# Set AWS_CLIENTS_EAGER=1 to build them all at import time instead.
+s3 = LazyClient('s3')
+transcribe = LazyClient('transcribe')
+translate = LazyClient('translate')
+polly = LazyClient('polly')
+
+# Provisioned-concurrency environments are initialized ahead of traffic, so
+# building the clients there takes them off the first request's critical path
+if (os.environ.get('AWS_CLIENTS_EAGER') == '1'
+        or os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency'):
+    warm_up()
 
 # Configuration
-INPUT_BUCKET = 'voice-translator-faizal07'
-OUTPUT_BUCKET = 'voice-translator-faizal07'
+INPUT_BUCKET = os.environ.get('INPUT_BUCKET', 'voice-translator-faizal07')
+
+# How long a status poll waits for the transcript event to complete a job
+# before doing the translation itself
+COMPLETION_GRACE_SECONDS = 30
+
+# Only one invocation at a time translates and synthesizes a job (or segment).
+# Its lease is taken over if it hasn't finished after COMPLETION_LEASE_SECONDS,
+# e.g. because that invocation crashed; other pollers are told to retry soon.
+COMPLETION_LEASE_SECONDS = 60
+COMPLETION_RETRY_AFTER_MS = 1000
+
+# Long-polling status checks (GET ?jobId=...&wait=<seconds>). Keep the limit
+# under API Gateway's 29 s integration timeout.
+LONG_POLL_MAX_SECONDS = 20
+LONG_POLL_INITIAL_DELAY = 0.5
+LONG_POLL_MAX_DELAY = 4
+LONG_POLL_SAFETY_SECONDS = 1
+
+# Job records: 's3' (jobs/{shard}/{date}/{id}.json, see s3_keys), 'dynamodb' (JOB_TABLE) or 'memory'
+JOB_STORE = os.environ.get('JOB_STORE', 's3')
+JOB_TABLE = os.environ.get('JOB_TABLE', 'voice-translator-jobs')
+JOB_TTL_SECONDS = 24 * 3600
+
+# Jobs are failed once they overrun their expected transcription time
+# (estimated from the upload size and recent jobs) JOB_TIMEOUT_FACTOR times
+# over, plus the completion grace period; never sooner than
+# JOB_TIMEOUT_SECONDS or later than JOB_TIMEOUT_MAX_SECONDS
+JOB_TIMEOUT_SECONDS = 45
+JOB_TIMEOUT_FACTOR = 2
+JOB_TIMEOUT_MAX_SECONDS = 15 * 60
+
+# PROCESSING responses carry retryAfterMs: the time until the transcript is
+# expected, within these bounds
+MIN_RETRY_AFTER_MS = 1000
+MAX_RETRY_AFTER_MS = 30000
+
+# Upload limits for the multipart parser
+MAX_AUDIO_BYTES = 10 * 1024 * 1024
+MAX_BODY_BYTES = MAX_AUDIO_BYTES + 64 * 1024
+
+# Direct browser uploads (presigned POST to input/{jobId}.{ext}) skip API
+# Gateway's payload limit, so they have their own
+DIRECT_UPLOAD_MAX_BYTES = int(os.environ.get('DIRECT_UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+UPLOAD_URL_EXPIRY_SECONDS = 300
+
+# Content types accepted for direct uploads, by media format
+UPLOAD_CONTENT_TYPES = {
+    'audio/webm': 'webm',
+    'audio/ogg': 'ogg-opus',
+    'audio/wav': 'pcm',
+    'audio/x-wav': 'pcm',
+    'audio/wave': 'pcm',
+    'audio/flac': 'flac'
+}
+
+# Clips up to this duration (or size, when the duration isn't in the header) are
+# transcribed over a streaming connection and answered synchronously instead of
+# through a batch job
+SYNC_MAX_AUDIO_BYTES = int(os.environ.get('SYNC_MAX_AUDIO_BYTES', 50000))
+SYNC_MAX_AUDIO_SECONDS = float(os.environ.get('SYNC_MAX_AUDIO_SECONDS', 15))
+
+# WAV uploads are trimmed, downmixed and resampled before transcription when
+# NumPy is available (set AUDIO_PREPROCESS=0 to store them as uploaded)
+AUDIO_PREPROCESS = os.environ.get('AUDIO_PREPROCESS', '1') == '1'
+
+# Directly uploaded WAV is read back for preprocessing and segmentation up to
+# this size (normalizing it takes several times as much memory); larger
+# uploads are transcribed as they are. Browser recordings (WebM, Ogg) are
+# always transcribed as uploaded, there is no decoder for them here
+UPLOAD_PREPROCESS_MAX_BYTES = 100 * 1024 * 1024
+
+# WAV recordings longer than SEGMENT_MIN_SECONDS are split at pauses into
+# segments of about SEGMENT_SECONDS (or more, to stay near MAX_SEGMENTS), each
+# transcribed by its own concurrent job
+SEGMENT_MIN_SECONDS = float(os.environ.get('SEGMENT_MIN_SECONDS', 60))
+SEGMENT_SECONDS = float(os.environ.get('SEGMENT_SECONDS', 30))
+MAX_SEGMENTS = 20
+
+# Segmented jobs run their transcriptions in parallel, so their estimate
+# follows the longest segment rather than the recording length; they also
+# need time to stitch, so their timeout is never below this
+SEGMENTED_JOB_TIMEOUT_SECONDS = 120
+
+# Upper bound on target languages translated and synthesized at once
+MAX_FANOUT_WORKERS = 8
+
+# Synthesized speech is stored under a hash of (text, voice, engine, format)
+# (s3_keys.synthesis_key) and deleted by the scheduled sweep once it is this old
+TTS_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# Polly takes at most 3000 characters per request. Longer text is synthesized
+# as sentence-aligned chunks in parallel and joined. The first chunk is kept
+# short and published as soon as it is ready so playback can start early.
+SPEECH_CHUNK_CHARS = int(os.environ.get('SPEECH_CHUNK_CHARS', 1500))
+SPEECH_FIRST_CHUNK_CHARS = 300
+SPEECH_CHUNK_WORKERS = 4
+
+# Speech output options a request may choose ({"audioFormat", "sampleRate"}):
+# Polly format -> content type, and Polly's sample rates
+SPEECH_FORMATS = {'mp3': 'audio/mpeg', 'ogg_vorbis': 'audio/ogg'}
+SPEECH_SAMPLE_RATES = ('8000', '16000', '22050', '24000')
+SPEECH_OPTION_FIELDS = ('audioResponse', 'audioFormat', 'sampleRate')
+DEFAULT_SPEECH = {'inline': False, 'format': 'mp3', 'sampleRate': None}
+
+# With {"audioResponse": "inline"}, speech up to this size is returned
+# base64-encoded in the response instead of being stored in S3 and fetched
+# by the browser; longer speech keeps the S3 path. With the DynamoDB job
+# store, keep it well under the 400 KB item limit for all target languages.
+INLINE_AUDIO_MAX_BYTES = int(os.environ.get('INLINE_AUDIO_MAX_BYTES', 64 * 1024))
+
+# Translation cache: in-process LRU backed by S3 objects under cache/translate/
+TRANSLATION_CACHE_SIZE = 1024
+TRANSLATION_CACHE_TTL = 30 * 24 * 3600  # 30 days
+
+translation_cache = TranslationCache(
+    S3CacheBackend(s3, INPUT_BUCKET, prefix=s3_keys.TRANSLATION_CACHE, ttl_seconds=TRANSLATION_CACHE_TTL),
+    maxsize=TRANSLATION_CACHE_SIZE
+)
+
+# Entries are per sentence, so utterances that repeat earlier sentences only
+# send the new ones to Translate
+translation_memory = TranslationMemory(translation_cache)
+
+# Transcripts of previously seen audio, keyed by content hash: 's3'
+# (cache/fingerprints/) or 'memory'. Replayed clips skip Transcribe entirely.
+FINGERPRINT_STORE = os.environ.get('FINGERPRINT_STORE', 's3')
+FINGERPRINT_TTL_SECONDS = 7 * 24 * 3600
+
+if FINGERPRINT_STORE == 'memory':
+    fingerprint_index = FingerprintIndex(MemoryCacheBackend(FINGERPRINT_TTL_SECONDS))
+else:
+    fingerprint_index = FingerprintIndex(
+        S3CacheBackend(s3, INPUT_BUCKET, prefix=s3_keys.FINGERPRINTS, ttl_seconds=FINGERPRINT_TTL_SECONDS)
+    )
+
+# Rolling history of Transcribe durations per language and media format:
+# 's3' (cache/transcribe-durations/) or 'memory'
+DURATION_HISTORY_STORE = os.environ.get('DURATION_HISTORY_STORE', 's3')
+DURATION_HISTORY_TTL_SECONDS = 30 * 24 * 3600
+
+if DURATION_HISTORY_STORE == 'memory':
+    duration_estimator = DurationEstimator(MemoryCacheBackend(DURATION_HISTORY_TTL_SECONDS))
+else:
+    duration_estimator = DurationEstimator(
+        S3CacheBackend(s3, INPUT_BUCKET, prefix=s3_keys.TRANSCRIBE_DURATIONS, ttl_seconds=DURATION_HISTORY_TTL_SECONDS)
+    )
+
+# Per-pair translation routes, e.g. TRANSLATE_ROUTES='{"hi-*": ["auto", "pivot"]}'
+translation_routes = RouteTable(json.loads(os.environ.get('TRANSLATE_ROUTES', '{}')))
+
+# Translate and Polly calls go through circuit breakers, so a path that keeps
+# failing (e.g. the neural engine for a voice) fails fast for
+# CIRCUIT_OPEN_SECONDS instead of being waited on before the fallback. Calls
+# slower than HEDGE_PERCENTILE of recent ones of their size get a second,
+# identical request and the first answer wins (HEDGE_PERCENTILE=0 disables).
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 90))
+CIRCUIT_OPEN_SECONDS = 30
+
+resilience = Resilience(hedge_percentile=HEDGE_PERCENTILE, open_seconds=CIRCUIT_OPEN_SECONDS)
+
+if JOB_STORE == 'dynamodb':
+    job_store = DynamoDBJobStore(LazyClient('dynamodb'), JOB_TABLE, JOB_TTL_SECONDS)
+elif JOB_STORE == 'memory':
+    job_store = InMemoryJobStore(JOB_TTL_SECONDS)
+else:
+    job_store = S3JobStore(s3, INPUT_BUCKET, ttl_seconds=JOB_TTL_SECONDS, key_for=s3_keys.job_key)
+
+# A scheduled sweep (an EventBridge rule invoking the function, e.g. hourly)
+# deletes uploads, transcripts, joined speech and S3 job records once they are
+# ARTIFACT_RETENTION_DAYS old (keep it above the job TTL), and cached speech,
+# translations, fingerprints and durations once their TTL is up. A sweep stops SWEEP_SAFETY_SECONDS before the
+# invocation would time out and the next one carries on.
+ARTIFACT_RETENTION_DAYS = float(os.environ.get('ARTIFACT_RETENTION_DAYS', 7))
+SWEEP_SAFETY_SECONDS = 10
+
+artifact_sweeper = Sweeper(
+    s3, INPUT_BUCKET, retention_seconds=ARTIFACT_RETENTION_DAYS * 24 * 3600,
+    aged_prefixes={
+        s3_keys.TTS_CACHE: TTS_CACHE_TTL_SECONDS,
+        s3_keys.TRANSLATION_CACHE: TRANSLATION_CACHE_TTL,
+        s3_keys.FINGERPRINTS: FINGERPRINT_TTL_SECONDS,
+        s3_keys.TRANSCRIBE_DURATIONS: DURATION_HISTORY_TTL_SECONDS
+    }
+)
+
+# Transcriber for the synchronous short-clip path (None disables it). Anything
+# with a `formats` set and transcribe(audio, media_format, language_code) works.
+streaming_transcriber = default_transcriber()
 
 # Supported language codes for Amazon Transcribe
 TRANSCRIBE_LANGUAGES = {
@@ -37,8 +256,36 @@ TRANSCRIBE_LANGUAGES = {
 }
 
 def lambda_handler(event, context):
+    # Stage timings are collected for the whole invocation and logged once
+    metrics.begin(event_operation(event))
     try:
-        print("Received event:", json.dumps(event))
+        return handle_event(event, context)
+    finally:
+        metrics.flush()
+
+def event_operation(event):
+    """Name of the kind of request, used as the metrics dimension"""
+    if 'Records' in event:
+        keys = [event_object_key(record) for record in event['Records']]
+        return 'upload_event' if keys and all(s3_keys.is_input_key(key) for key in keys) else 'transcript_event'
+    if event.get('source') == 'aws.events':
+        return 'sweep'
+    if event.get('httpMethod') == 'GET':
+        return 'status'
+    return (event.get('httpMethod') or 'unknown').lower()
+
+def handle_event(event, context):
+    # S3 notifications for new uploads and transcripts
+    if 'Records' in event:
+        return s3_event_handler(event, context)
+    
+    # Scheduled sweeps of expired job objects
+    if event.get('source') == 'aws.events':
+        return sweep_event_handler(event, context)
+    
+    try:
+        # Never log the (base64) audio body itself
+        print("Received event:", json.dumps(redact_event(event)))
         
         # Handle OPTIONS requests (CORS preflight)
         if event.get('httpMethod') == 'OPTIONS':
@@ -59,7 +306,7 @@ def lambda_handler(event, context):
             job_id = params.get('jobId')
             
             if job_id:
-                return check_job_status(job_id)
+                return check_job_status(job_id, parse_wait(params.get('wait')), context)
         
         # Check if headers exist
         headers = event.get('headers', {})
@@ -75,6 +322,10 @@ def lambda_handler(event, context):
             
         print("Content-Type:", content_type)
         
+        # JSON requests ask for a presigned POST to upload the audio straight to S3
+        if 'application/json' in content_type:
+            return create_upload(event)
+        
         # For API Gateway test console (not multipart/form-data)
         if 'multipart/form-data' not in content_type:
             # Handle simple JSON for testing
@@ -98,26 +349,28 @@ def lambda_handler(event, context):
         if event.get('isBase64Encoded', False):
             body = base64.b64decode(body)
         
-        # Process multipart form data
+        # Process multipart form data. Fields are views into the decoded body,
+        # so the audio is not copied again while parsing
         boundary = extract_boundary(content_type)
-        parts = parse_multipart(body, boundary)
+        try:
+            with metrics.stage('parse'):
+                parts = parse_multipart(body, boundary, MAX_AUDIO_BYTES, MAX_BODY_BYTES)
+        except MultipartError as e:
+            return error_response(f"Invalid upload: {str(e)}")
         
         # Get audio data and languages
         audio_data = parts.get('audio', [b''])[0]
-        source_language = parts.get('sourceLanguage', ['en'])[0]
-        target_language = parts.get('targetLanguage', ['es'])[0]
-        
-        # Convert bytes to string if needed
-        if isinstance(source_language, bytes):
-            source_language = source_language.decode('utf-8')
-        if isinstance(target_language, bytes):
-            target_language = target_language.decode('utf-8')
+        source_language = form_value(parts, 'sourceLanguage', 'en')
+        target_languages = target_language_list([bytes(value).decode('utf-8') for value in parts.get('targetLanguage', [])])
+        try:
+            speech = speech_options({name: form_value(parts, name, None) for name in SPEECH_OPTION_FIELDS})
+        except ValueError as e:
+            return error_response(str(e))
         
         # Check for unsupported languages and replace with English
         if source_language == 'fr' or source_language == 'id':
             source_language = 'en'
-        if target_language == 'fr' or target_language == 'id':
-            target_language = 'en'
+        target_language = target_languages[0]
         
         # Map source language code to Transcribe language code
         transcribe_language = TRANSCRIBE_LANGUAGES.get(source_language, 'en-US')
@@ -126,78 +379,79 @@ def lambda_handler(event, context):
             return error_response("No audio data found")
         
         # Generate unique file names
-        file_id = str(uuid.uuid4())
-        webm_file = f"{file_id}.webm"
+        file_id = s3_keys.new_job_id()
+        media_format = detect_media_format(audio_data)
+        
+        # Audio that was uploaded before reuses its transcript, skipping
+        # preprocessing, the S3 upload and Transcribe
+        audio_fingerprint = fingerprint(audio_data)
+        known_text = lookup_transcript(audio_fingerprint, transcribe_language)
+        if known_text is not None:
+            try:
+                return immediate_response(file_id, known_text, source_language, target_languages, speech)
+            except Exception as e:
+                print(f"Error translating known transcript: {str(e)}")
         
-        # Upload the webm file directly to S3
-        webm_key = f"input/{webm_file}"
-        s3.put_object(Bucket=INPUT_BUCKET, Key=webm_key, Body=audio_data)
+        audio_data, trimmed_seconds = preprocess_audio(audio_data, media_format)
         
-        # For short audio clips (less than 5 seconds), use synchronous processing
-        if len(audio_data) < 50000:  # Rough estimate for short audio
+        # Short clips are transcribed over a streaming connection and answered
+        # in this same response, skipping the batch job and status polling
+        if use_streaming_path(audio_data, media_format):
             try:
-                # Use a simpler approach for short audio
-                # This is a placeholder text based on the source language
-                placeholder_text = f"Short message in {source_language}"
-                
-                # Translate the text
-                translated_text = translate_text(placeholder_text, source_language, target_language)
-                
-                # Convert translated text to speech
-                output_key = f"output/{file_id}.mp3"
-                text_to_speech(translated_text, target_language, INPUT_BUCKET, output_key)
-                
-                # Generate a pre-signed URL for the output audio
-                audio_url = s3.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': INPUT_BUCKET, 'Key': output_key},
-                    ExpiresIn=3600
-                )
+                with metrics.stage('transcribe_stream'):
+                    original_text = streaming_transcriber.transcribe(audio_data, media_format, transcribe_language)
+                if not original_text:
+                    original_text = "No speech detected in the audio"
+                fingerprint_index.record(audio_fingerprint, transcribe_language, original_text)
                 
                 # Return immediate response for short audio
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                    },
-                    'body': json.dumps({
-                        'originalText': placeholder_text,
-                        'translatedText': translated_text,
-                        'audioUrl': audio_url
-                    })
-                }
+                return immediate_response(
+                    file_id, original_text, source_language, target_languages, speech, trimmedSeconds=trimmed_seconds
+                )
             except Exception as e:
                 print(f"Error in synchronous processing: {str(e)}")
                 # Fall back to asynchronous processing
                 pass
         
-        # Start transcription job directly on the WebM file
-        transcription_job_name = f"transcribe-{file_id}"
-        start_transcription_job(transcription_job_name, INPUT_BUCKET, webm_key, transcribe_language)
+        # Long WAV recordings are transcribed as several segments in parallel
+        segments = split_recording(audio_data, media_format)
+        if segments:
+            return start_segmented_job(
+                file_id, segments, source_language, target_languages, transcribe_language, trimmed_seconds,
+                audio_fingerprint
+            )
+        
+        # Upload the audio file directly to S3
+        input_key = s3_keys.input_key(file_id, FILE_EXTENSIONS[media_format])
+        with metrics.stage('upload'):
+            s3.put_object(Bucket=INPUT_BUCKET, Key=input_key, Body=ViewReader(audio_data))
+        
+        # Start transcription job directly on the uploaded file
+        transcription_job_name = s3_keys.transcription_job_name(file_id)
+        start_transcription_job(
+            transcription_job_name, INPUT_BUCKET, input_key, transcribe_language, BATCH_MEDIA_FORMATS[media_format]
+        )
         
-        # Save job info to S3 for status checking
+        # Save job info for status checking
         job_info = {
             'jobId': file_id,
             'status': 'TRANSCRIBING',
             'sourceLanguage': source_language,
             'targetLanguage': target_language,
+            'targetLanguages': target_languages,
             'transcriptionJobName': transcription_job_name,
-            'webmKey': webm_key,
-            'startTime': time.time(),
-            'checkCount': 0  # Add a counter to track number of status checks
+            'inputKey': input_key,
+            'mediaFormat': media_format,
+            'speech': speech,
+            'audioBytes': len(audio_data),
+            'estimatedSeconds': estimate_transcription(transcribe_language, media_format, len(audio_data)),
+            'trimmedSeconds': trimmed_seconds,
+            'audioFingerprint': audio_fingerprint,
+            'startTime': time.time()
         }
         
-        # Save job info to S3
-        job_info_key = f"jobs/{file_id}.json"
-        s3.put_object(
-            Bucket=INPUT_BUCKET,
-            Key=job_info_key,
-            Body=json.dumps(job_info),
-            ContentType='application/json'
-        )
+        # Save job info to the job store
+        job_store.create(job_info)
         
         # Return job ID for status checking
         return {
@@ -211,7 +465,8 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'jobId': file_id,
                 'status': 'PROCESSING',
-                'message': 'Your audio is being processed. Check status with the jobId.'
+                'message': 'Your audio is being processed. Check status with the jobId.',
+                'retryAfterMs': retry_after_ms(job_info)
             })
         }
             
@@ -219,248 +474,136 @@ def lambda_handler(event, context):
         print(f"Error: {str(e)}")
         return error_response(f"Error processing request: {str(e)}")
 
-def check_job_status(job_id):
-    """Check the status of a translation job"""
-    try:
-        # Get job info from S3
-        job_info_key = f"jobs/{job_id}.json"
+def check_job_status(job_id, wait=0, context=None):
+    """Check the status of a translation job, holding the request up to `wait` seconds
+    
+    While the job is still processing it is re-checked with exponential backoff,
+    and the response is returned as soon as the job completes or fails.
+    """
+    wait = min(wait, LONG_POLL_MAX_SECONDS)
+    if context is not None:
+        # Leave time to respond before the Lambda itself times out
+        wait = min(wait, context.get_remaining_time_in_millis() / 1000.0 - LONG_POLL_SAFETY_SECONDS)
+    deadline = time.time() + wait
+    delay = LONG_POLL_INITIAL_DELAY
+    
+    while True:
+        response = get_job_status(job_id)
+        body = json.loads(response['body'])
+        if body.get('status') != 'PROCESSING':
+            return response
         
-        try:
-            job_info_response = s3.get_object(Bucket=INPUT_BUCKET, Key=job_info_key)
-            job_info = json.loads(job_info_response['Body'].read().decode('utf-8'))
-        except Exception as e:
-            print(f"Error getting job info: {str(e)}")
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return response
+        # Don't re-check much before the job is expected to be done
+        hint = body.get('retryAfterMs', 0) / 1000.0
+        time.sleep(min(max(delay, hint), LONG_POLL_MAX_DELAY, remaining))
+        delay = min(delay * 2, LONG_POLL_MAX_DELAY)
+
+def parse_wait(value):
+    """Parse the `wait` query parameter into seconds"""
+    try:
+        return max(0.0, float(value or 0))
+    except ValueError:
+        return 0.0
+
+def get_job_status(job_id):
+    """Check the status of a translation job once"""
+    try:
+        # Get job info from the job store; polling only writes when the state changes
+        job_info = job_store.get(job_id)
+        if job_info is None:
             return error_response(f"Job not found: {job_id}")
         
         # Check if job is already completed
         if job_info.get('status') == 'COMPLETED':
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                },
-                'body': json.dumps({
-                    'jobId': job_id,
-                    'status': 'COMPLETED',
-                    'originalText': job_info.get('originalText', ''),
-                    'translatedText': job_info.get('translatedText', ''),
-                    'audioUrl': job_info.get('audioUrl', '')
-                })
-            }
+            return job_result_response(job_info)
         
-        # Increment check count
-        check_count = job_info.get('checkCount', 0) + 1
-        job_info['checkCount'] = check_count
-        
-        # If we've checked too many times, return a timeout error
-        if check_count > 15:  # Limit to 15 checks
-            job_info['status'] = 'FAILED'
-            job_info['error'] = "Processing timeout. Please try again with a shorter audio clip."
-            s3.put_object(
-                Bucket=INPUT_BUCKET,
-                Key=job_info_key,
-                Body=json.dumps(job_info),
-                ContentType='application/json'
-            )
+        if job_info.get('status') == 'UPLOADING':
+            return upload_status(job_info)
+        
+        if job_info.get('status') == 'FAILED':
+            return error_response(job_info.get('error', 'Processing failed'))
+        
+        # If the job has run far longer than expected, return a timeout error,
+        # unless an invocation is completing it right now
+        if time.time() - job_info.get('startTime', 0) > job_timeout(job_info) and not lease_held(job_info):
+            try:
+                job_store.update(job_id, {
+                    'status': 'FAILED',
+                    'error': "Processing timeout. Please try again with a shorter audio clip."
+                }, {'status': job_info['status']})
+            except ConditionFailed:
+                # Another invocation changed the job first, report its outcome
+                return get_job_status(job_id)
             return error_response("Processing timeout. Please try again with a shorter audio clip.")
         
-        # Save updated job info with incremented check count
-        s3.put_object(
-            Bucket=INPUT_BUCKET,
-            Key=job_info_key,
-            Body=json.dumps(job_info),
-            ContentType='application/json'
-        )
+        # Known audio goes straight from upload to translation
+        if job_info.get('status') == 'TRANSLATING':
+            return success_response({
+                'jobId': job_id,
+                'status': 'PROCESSING',
+                'message': 'Transcript reused, translating...',
+                'results': job_info.get('results', {}),
+                'retryAfterMs': COMPLETION_RETRY_AFTER_MS
+            })
+        
+        if job_info.get('segments'):
+            return segmented_job_status(job_info)
+        
+        # The transcript event completes the job, so polling is a job store
+        # read; Transcribe is only asked once that event could be overdue
+        expected = job_info.get('startTime', 0) + (job_info.get('estimatedSeconds') or 0)
+        if time.time() < expected + COMPLETION_GRACE_SECONDS:
+            return success_response({
+                'jobId': job_id,
+                'status': 'PROCESSING',
+                'message': 'Transcribing audio...',
+                'retryAfterMs': retry_after_ms(job_info)
+            })
         
         # Check transcription job status
         transcription_job_name = job_info.get('transcriptionJobName')
-        source_language = job_info.get('sourceLanguage')
-        target_language = job_info.get('targetLanguage')
         
         try:
             response = transcribe.get_transcription_job(TranscriptionJobName=transcription_job_name)
-            status = response['TranscriptionJob']['TranscriptionJobStatus']
+            transcription_job = response['TranscriptionJob']
+            status = transcription_job['TranscriptionJobStatus']
             
             if status == 'COMPLETED':
-                # Get the transcript
-                transcript_key = f"transcripts/{transcription_job_name}.json"
+                # Translation and speech synthesis are normally run by
+                # transcript_event_handler as soon as the transcript lands in S3.
+                # Only finish the job here if that event hasn't done so in time.
+                if not completion_overdue(transcription_job):
+                    return success_response({
+                        'jobId': job_id,
+                        'status': 'PROCESSING',
+                        'message': 'Transcription complete, translating...',
+                        'results': job_info.get('results', {}),
+                        'firstAudioUrl': job_info.get('firstAudioUrl', ''),
+                        'firstAudioUrls': job_info.get('firstAudioUrls', {}),
+                        'retryAfterMs': COMPLETION_RETRY_AFTER_MS
+                    })
                 
-                try:
-                    transcript_response = s3.get_object(Bucket=INPUT_BUCKET, Key=transcript_key)
-                    transcript_content = transcript_response['Body'].read().decode('utf-8')
-                    transcription_result = json.loads(transcript_content)
-                    
-                    # Extract the transcribed text
-                    original_text = transcription_result.get('results', {}).get('transcripts', [{}])[0].get('transcript', '')
-                    
-                    if not original_text:
-                        original_text = "No speech detected in the audio"
-                    
-                    # Translate the text
-                    translated_text = translate_text(original_text, source_language, target_language)
-                    
-                    # Convert translated text to speech
-                    output_key = f"output/{job_id}.mp3"
-                    text_to_speech(translated_text, target_language, INPUT_BUCKET, output_key)
-                    
-                    # Generate a pre-signed URL for the output audio
-                    audio_url = s3.generate_presigned_url(
-                        'get_object',
-                        Params={'Bucket': INPUT_BUCKET, 'Key': output_key},
-                        ExpiresIn=3600  # URL expires in 1 hour
-                    )
-                    
-                    # Update job info
-                    job_info['status'] = 'COMPLETED'
-                    job_info['originalText'] = original_text
-                    job_info['translatedText'] = translated_text
-                    job_info['audioUrl'] = audio_url
-                    job_info['completionTime'] = time.time()
-                    
-                    # Save updated job info
-                    s3.put_object(
-                        Bucket=INPUT_BUCKET,
-                        Key=job_info_key,
-                        Body=json.dumps(job_info),
-                        ContentType='application/json'
-                    )
-                    
-                    # Return results
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                        },
-                        'body': json.dumps({
-                            'jobId': job_id,
-                            'status': 'COMPLETED',
-                            'originalText': original_text,
-                            'translatedText': translated_text,
-                            'audioUrl': audio_url
-                        })
-                    }
-                    
-                except Exception as e:
-                    print(f"Error processing transcript: {str(e)}")
-                    # For transcript processing errors, create a fallback response
-                    fallback_text = f"Audio in {source_language}"
-                    translated_text = translate_text(fallback_text, 'en', target_language)
-                    
-                    # Generate audio for fallback text
-                    output_key = f"output/{job_id}.mp3"
-                    text_to_speech(translated_text, target_language, INPUT_BUCKET, output_key)
-                    
-                    # Generate URL
-                    audio_url = s3.generate_presigned_url(
-                        'get_object',
-                        Params={'Bucket': INPUT_BUCKET, 'Key': output_key},
-                        ExpiresIn=3600
-                    )
-                    
-                    # Update job info
-                    job_info['status'] = 'COMPLETED'
-                    job_info['originalText'] = fallback_text
-                    job_info['translatedText'] = translated_text
-                    job_info['audioUrl'] = audio_url
-                    job_info['completionTime'] = time.time()
-                    
-                    # Save updated job info
-                    s3.put_object(
-                        Bucket=INPUT_BUCKET,
-                        Key=job_info_key,
-                        Body=json.dumps(job_info),
-                        ContentType='application/json'
-                    )
-                    
-                    # Return fallback results
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                        },
-                        'body': json.dumps({
-                            'jobId': job_id,
-                            'status': 'COMPLETED',
-                            'originalText': fallback_text,
-                            'translatedText': translated_text,
-                            'audioUrl': audio_url
-                        })
-                    }
+                print(f"Transcript event overdue for job {job_id}, completing inline")
+                record_transcription_time(job_info, transcription_seconds(transcription_job))
+                completed = with_completion_lease(job_info, complete_job_from_transcript)
+                return job_result_response(completed) if completed else completion_pending_response(job_info)
                 
             elif status == 'FAILED':
-                # For failed transcription, create a fallback response
-                fallback_text = f"Audio in {source_language}"
-                translated_text = translate_text(fallback_text, 'en', target_language)
-                
-                # Generate audio for fallback text
-                output_key = f"output/{job_id}.mp3"
-                text_to_speech(translated_text, target_language, INPUT_BUCKET, output_key)
-                
-                # Generate URL
-                audio_url = s3.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': INPUT_BUCKET, 'Key': output_key},
-                    ExpiresIn=3600
-                )
-                
-                # Update job info
-                job_info['status'] = 'COMPLETED'
-                job_info['originalText'] = fallback_text
-                job_info['translatedText'] = translated_text
-                job_info['audioUrl'] = audio_url
-                job_info['completionTime'] = time.time()
-                
-                # Save updated job info
-                s3.put_object(
-                    Bucket=INPUT_BUCKET,
-                    Key=job_info_key,
-                    Body=json.dumps(job_info),
-                    ContentType='application/json'
-                )
-                
-                # Return fallback results
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                    },
-                    'body': json.dumps({
-                        'jobId': job_id,
-                        'status': 'COMPLETED',
-                        'originalText': fallback_text,
-                        'translatedText': translated_text,
-                        'audioUrl': audio_url
-                    })
-                }
+                # No transcript is written for failed jobs, so no event will arrive
+                completed = with_completion_lease(job_info, complete_job_with_fallback)
+                return job_result_response(completed) if completed else completion_pending_response(job_info)
             
             else:
                 # Still processing
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
-                    },
-                    'body': json.dumps({
-                        'jobId': job_id,
-                        'status': 'PROCESSING',
-                        'message': f"Transcription status: {status}"
-                    })
-                }
+                return success_response({
+                    'jobId': job_id,
+                    'status': 'PROCESSING',
+                    'message': f"Transcription status: {status}",
+                    'retryAfterMs': retry_after_ms(job_info)
+                })
                 
         except Exception as e:
             print(f"Error checking transcription job: {str(e)}")
@@ -470,130 +613,925 @@ def check_job_status(job_id):
         print(f"Error checking job status: {str(e)}")
         return error_response(f"Error checking job status: {str(e)}")
 
-def extract_boundary(content_type):
-    """Extract boundary from content-type header"""
-    for part in content_type.split(';'):
-        part = part.strip()
-        if part.startswith('boundary='):
-            boundary = part[9:]
-            if boundary.startswith('"') and boundary.endswith('"'):
-                boundary = boundary[1:-1]
-            return boundary.encode('utf-8')
-    return None
-
-def parse_multipart(body, boundary):
-    """Parse multipart form data"""
-    if isinstance(body, str):
-        body = body.encode('utf-8')
-    
-    boundary = b'--' + boundary
-    parts = {}
-    
-    # Split the body by boundary
-    body_parts = body.split(boundary)
-    
-    # Process each part
-    for part in body_parts:
-        if not part or part == b'--\r\n' or part == b'--':
-            continue
-        
-        # Split headers and content
+def create_upload(event):
+    """Create a job awaiting a direct upload and return a presigned POST for its audio
+    
+    The request body is JSON: {"sourceLanguage", "targetLanguage" (string or
+    list), "contentType"}. The browser then POSTs the audio to S3 itself, and
+    the object-created event on input/ starts transcription.
+    """
+    body = event.get('body') or '{}'
+    if event.get('isBase64Encoded', False):
+        body = base64.b64decode(body)
+    try:
+        request = json.loads(body)
+    except ValueError:
+        return error_response("Invalid JSON body")
+    
+    content_type = (request.get('contentType') or 'audio/webm').split(';')[0].strip().lower()
+    media_format = UPLOAD_CONTENT_TYPES.get(content_type)
+    if media_format is None:
+        return error_response(f"Unsupported content type: {content_type}")
+    
+    target_languages = request.get('targetLanguages') or request.get('targetLanguage')
+    if isinstance(target_languages, str):
+        target_languages = [target_languages]
+    target_languages = target_language_list(target_languages)
+    source_language = request.get('sourceLanguage') or 'en'
+    if source_language == 'fr' or source_language == 'id':
+        source_language = 'en'
+    try:
+        speech = speech_options(request)
+    except ValueError as e:
+        return error_response(str(e))
+    
+    job_id = s3_keys.new_job_id()
+    input_key = s3_keys.input_key(job_id, FILE_EXTENSIONS[media_format])
+    
+    job_store.create({
+        'jobId': job_id,
+        'status': 'UPLOADING',
+        'sourceLanguage': source_language,
+        'targetLanguage': target_languages[0],
+        'targetLanguages': target_languages,
+        'mediaFormat': media_format,
+        'speech': speech,
+        'inputKey': input_key,
+        'createdTime': time.time()
+    })
+    
+    # The policy pins the key and content type and bounds the size
+    upload = s3.generate_presigned_post(
+        Bucket=INPUT_BUCKET,
+        Key=input_key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, DIRECT_UPLOAD_MAX_BYTES]
+        ],
+        ExpiresIn=UPLOAD_URL_EXPIRY_SECONDS
+    )
+    
+    return success_response({
+        'jobId': job_id,
+        'status': 'UPLOADING',
+        'upload': {'url': upload['url'], 'fields': upload['fields']},
+        'maxBytes': DIRECT_UPLOAD_MAX_BYTES
+    })
+
+def upload_status(job_info):
+    """Status of a job whose audio has not arrived in S3 yet"""
+    if time.time() - job_info.get('createdTime', 0) > UPLOAD_URL_EXPIRY_SECONDS + COMPLETION_GRACE_SECONDS:
+        try:
+            job_store.update(job_info['jobId'], {
+                'status': 'FAILED',
+                'error': "The audio upload was never received. Please try again."
+            }, {'status': 'UPLOADING'})
+        except ConditionFailed:
+            return get_job_status(job_info['jobId'])
+        return error_response("The audio upload was never received. Please try again.")
+    
+    return success_response({
+        'jobId': job_info['jobId'],
+        'status': 'PROCESSING',
+        'message': 'Waiting for the audio upload...'
+    })
+
+def sweep_event_handler(event, context):
+    """Delete expired job objects (EventBridge scheduled event)"""
+    deadline = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - SWEEP_SAFETY_SECONDS
+    
+    with metrics.stage('sweep'):
+        stats = artifact_sweeper.sweep(deadline)
+    metrics.set_property('sweep', stats)
+    print(f"Swept {stats['deleted']} expired objects from {stats['days']} days"
+          + ("" if stats['complete'] else ", stopping before the timeout"))
+    return stats
+
+def event_object_key(record):
+    """Decoded object key of an S3 event record"""
+    return unquote_plus(record['s3']['object']['key'])
+
+def s3_event_handler(event, context):
+    """Route S3 object-created notifications: uploads under input/, transcripts under transcripts/"""
+    records = event.get('Records', [])
+    uploads = [record for record in records if s3_keys.is_input_key(event_object_key(record))]
+    transcripts = [record for record in records if not s3_keys.is_input_key(event_object_key(record))]
+    
+    result = {}
+    if uploads:
+        result.update(upload_event_handler({'Records': uploads}, context))
+    if transcripts:
+        result.update(transcript_event_handler({'Records': transcripts}, context))
+    return result
+
+def upload_event_handler(event, context):
+    """Start transcription of directly uploaded audio (s3:ObjectCreated:* on input/)"""
+    started = []
+    
+    for record in event.get('Records', []):
         try:
-            headers_raw, content = part.split(b'\r\n\r\n', 1)
-            headers = headers_raw.split(b'\r\n')
+            key = event_object_key(record)
+            job_id = s3_keys.job_id_from_input_key(key)
+            job_info = job_store.get(job_id) if job_id else None
             
-            # Extract content disposition
-            content_disposition = None
-            for header in headers:
-                if header.lower().startswith(b'content-disposition:'):
-                    content_disposition = header.decode('utf-8')
-                    break
+            # Audio uploaded by this function itself belongs to jobs that are
+            # already transcribing
+            if job_info is None or job_info.get('status') != 'UPLOADING':
+                print(f"Ignoring upload not awaited by any job: {key}")
+                continue
             
-            if content_disposition:
-                # Extract field name
-                name_match = content_disposition.find('name="')
-                if name_match != -1:
-                    name_start = name_match + 6
-                    name_end = content_disposition.find('"', name_start)
-                    field_name = content_disposition[name_start:name_end]
-                    
-                    # Remove trailing \r\n if present
-                    if content.endswith(b'\r\n'):
-                        content = content[:-2]
-                    
-                    # Add to parts dictionary
-                    if field_name not in parts:
-                        parts[field_name] = []
-                    parts[field_name].append(content)
+            transcribe_language = TRANSCRIBE_LANGUAGES.get(job_info['sourceLanguage'], 'en-US')
+            audio_fingerprint = None
+            if record['s3']['object'].get('eTag'):
+                audio_fingerprint = etag_fingerprint(record['s3']['object']['eTag'])
+            known_text = lookup_transcript(audio_fingerprint, transcribe_language) if audio_fingerprint else None
+            
+            # Claim the job so a repeated notification can't start a second transcription
+            transcription_job_name = s3_keys.transcription_job_name(job_id)
+            try:
+                job_info = job_store.update(job_id, {
+                    'status': 'TRANSCRIBING' if known_text is None else 'TRANSLATING',
+                    'transcriptionJobName': transcription_job_name,
+                    'audioBytes': record['s3']['object'].get('size'),
+                    'estimatedSeconds': estimate_transcription(
+                        transcribe_language, job_info.get('mediaFormat', 'webm'), record['s3']['object'].get('size')
+                    ),
+                    'audioFingerprint': audio_fingerprint,
+                    'startTime': time.time()
+                }, {'status': 'UPLOADING'})
+            except ConditionFailed:
+                print(f"Job {job_id} already started")
+                continue
+            
+            if known_text is not None:
+                try:
+                    with_completion_lease(
+                        job_info, lambda leased: complete_job(leased, known_text, leased.get('sourceLanguage'))
+                    )
+                except Exception as e:
+                    # No Transcribe job or transcript event will come along to retry it
+                    fail_job(job_id, f"Could not translate the transcript: {str(e)}", 'TRANSLATING')
+                    raise
+                started.append(job_id)
+                continue
+            
+            try:
+                if job_info.get('mediaFormat') == 'pcm' and start_uploaded_wav(job_info, key, transcribe_language):
+                    started.append(job_id)
+                    continue
+                start_transcription_job(
+                    transcription_job_name,
+                    INPUT_BUCKET,
+                    key,
+                    transcribe_language,
+                    BATCH_MEDIA_FORMATS[job_info.get('mediaFormat', 'webm')]
+                )
+            except Exception as e:
+                job_store.update(job_id, {'status': 'FAILED', 'error': f"Could not start transcription: {str(e)}"})
+                raise
+            started.append(job_id)
         except Exception as e:
-            print(f"Error parsing part: {str(e)}")
+            print(f"Error handling upload event: {str(e)}")
     
-    return parts
+    return {'started': started}
 
-def start_transcription_job(job_name, bucket, key, language_code):
+def transcript_event_handler(event, context):
+    """Finish jobs whose transcripts were just written to S3 (s3:ObjectCreated:* on transcripts/)"""
+    completed = []
+    
+    for record in event.get('Records', []):
+        try:
+            key = event_object_key(record)
+            job_id, segment = s3_keys.parse_transcript_key(key)
+            if not job_id:
+                print(f"Ignoring non-transcript object: {key}")
+                continue
+            
+            job_info = job_store.get(job_id)
+            if job_info is None:
+                print(f"No job record for transcript {key}")
+                continue
+            
+            if job_info.get('status') in ('COMPLETED', 'FAILED'):
+                print(f"Job {job_id} already {job_info['status'].lower()}, skipping")
+                continue
+            
+            if job_info.get('status') == 'TRANSCRIBING':
+                record_transcription_time(job_info, time.time() - job_info.get('startTime', time.time()), segment)
+            
+            if segment is not None:
+                complete_segment(job_info, segment)
+            elif with_completion_lease(job_info, complete_job_from_transcript) is None:
+                print(f"Job {job_id} is being completed by another invocation, skipping")
+                continue
+            completed.append(job_id)
+        except Exception as e:
+            print(f"Error handling transcript event: {str(e)}")
+    
+    return {'completed': completed}
+
+def completion_overdue(transcription_job):
+    """Whether the transcript event should already have completed this job"""
+    completion_time = transcription_job.get('CompletionTime')
+    if completion_time is None:
+        return True
+    return time.time() - completion_time.timestamp() > COMPLETION_GRACE_SECONDS
+
+def estimate_transcription(language_code, media_format, audio_bytes):
+    """Expected seconds until Transcribe delivers the transcript of an upload, from recent jobs"""
+    try:
+        return round(duration_estimator.estimate(language_code, media_format, audio_bytes), 1)
+    except Exception as e:
+        print(f"Error estimating transcription time: {str(e)}")
+        return None
+
+def transcription_seconds(transcription_job):
+    """How long Transcribe took for a job, or None if it doesn't say"""
+    if not transcription_job.get('CreationTime') or not transcription_job.get('CompletionTime'):
+        return None
+    return (transcription_job['CompletionTime'] - transcription_job['CreationTime']).total_seconds()
+
+def record_transcription_time(job_info, seconds, segment=None):
+    """Add a finished transcription (of the job, or one segment of it) to the duration history"""
+    if seconds is None:
+        return
+    transcribe_language = TRANSCRIBE_LANGUAGES.get(job_info.get('sourceLanguage'), 'en-US')
+    audio_bytes = job_info['segments'][segment].get('bytes') if segment is not None else job_info.get('audioBytes')
+    try:
+        duration_estimator.record(transcribe_language, job_info.get('mediaFormat', 'webm'), audio_bytes, seconds)
+    except Exception as e:
+        print(f"Error recording transcription time: {str(e)}")
+
+def job_timeout(job_info):
+    """Seconds after its start at which an unfinished job is failed"""
+    # A reused transcript only needs translating, which the completion lease bounds
+    if job_info.get('status') == 'TRANSLATING':
+        return max(JOB_TIMEOUT_SECONDS, COMPLETION_LEASE_SECONDS)
+    floor = SEGMENTED_JOB_TIMEOUT_SECONDS if job_info.get('segments') else JOB_TIMEOUT_SECONDS
+    estimate = job_info.get('estimatedSeconds')
+    if estimate is None:
+        return floor
+    return min(JOB_TIMEOUT_MAX_SECONDS, max(floor, estimate * JOB_TIMEOUT_FACTOR + COMPLETION_GRACE_SECONDS))
+
+def retry_after_ms(job_info):
+    """How long a client should wait before polling again: until the transcript is expected"""
+    estimate = job_info.get('estimatedSeconds')
+    if estimate is None:
+        return MIN_RETRY_AFTER_MS
+    remaining = job_info.get('startTime', 0) + estimate - time.time()
+    return int(min(MAX_RETRY_AFTER_MS, max(MIN_RETRY_AFTER_MS, remaining * 1000)))
+
+def with_completion_lease(job_info, complete, lease_name='completion'):
+    """Run complete(job_info) only if this invocation wins the job's completion lease
+    
+    Returns complete's result, or None when another invocation is already
+    completing the job (or has completed it).
+    """
+    owner = str(uuid.uuid4())
+    leased = job_store.acquire_lease(job_info['jobId'], lease_name, owner, COMPLETION_LEASE_SECONDS)
+    if leased is None:
+        metrics.count('completion_lease_lost')
+        return None
+    
+    try:
+        return complete(leased)
+    except Exception:
+        # Let the next event or poll retry right away instead of after the lease expires
+        job_store.release_lease(job_info['jobId'], lease_name, owner)
+        raise
+
+def lease_held(job_info):
+    """Whether some invocation holds an unexpired lease on the job, i.e. is still working on it"""
+    return any(lease['expires'] > time.time() for lease in (job_info.get('leases') or {}).values())
+
+def fail_job(job_id, error, status):
+    """Mark a job FAILED unless it has moved on from status in the meantime"""
+    try:
+        job_store.update(job_id, {'status': 'FAILED', 'error': error}, {'status': status})
+    except ConditionFailed:
+        print(f"Job {job_id} is no longer {status}, leaving it")
+
+def completion_pending_response(job_info):
+    """Answer a poll that lost the completion lease to another invocation"""
+    return success_response({
+        'jobId': job_info['jobId'],
+        'status': 'PROCESSING',
+        'message': 'Transcription complete, translating...',
+        'results': job_info.get('results', {}),
+        'retryAfterMs': COMPLETION_RETRY_AFTER_MS
+    })
+
+def complete_job_from_transcript(job_info):
+    """Translate and synthesize the transcript of a finished Transcribe job"""
+    # Time from upload until the transcript was available
+    metrics.record('transcribe_wait', (time.time() - job_info.get('startTime', time.time())) * 1000)
+    
+    try:
+        original_text = read_transcript(job_info['transcriptionJobName'])
+        if not original_text:
+            original_text = "No speech detected in the audio"
+    except Exception as e:
+        print(f"Error processing transcript: {str(e)}")
+        # For transcript processing errors, create a fallback response
+        return complete_job_with_fallback(job_info)
+    
+    remember_transcript(job_info, original_text)
+    return complete_job(job_info, original_text, job_info.get('sourceLanguage'))
+
+def lookup_transcript(audio_fingerprint, transcribe_language):
+    """Transcript previously produced for this audio, or None"""
+    original_text = fingerprint_index.lookup(audio_fingerprint, transcribe_language)
+    metrics.count('fingerprint_hit' if original_text is not None else 'fingerprint_miss')
+    metrics.set_property('fingerprintIndex', fingerprint_index.stats())
+    return original_text
+
+def remember_transcript(job_info, original_text):
+    """Index a job's transcript under its audio fingerprint, so replays can reuse it"""
+    if job_info.get('audioFingerprint'):
+        transcribe_language = TRANSCRIBE_LANGUAGES.get(job_info.get('sourceLanguage'), 'en-US')
+        fingerprint_index.record(job_info['audioFingerprint'], transcribe_language, original_text)
+
+def start_segmented_job(file_id, segments, source_language, target_languages, transcribe_language, trimmed_seconds,
+                        audio_fingerprint=None):
+    """Create a job for a recording split into segments, and start transcribing them"""
+    segment_records = start_segments(file_id, segments, transcribe_language)
+    
+    job_info = {
+        'jobId': file_id,
+        'status': 'TRANSCRIBING',
+        'sourceLanguage': source_language,
+        'targetLanguage': target_languages[0],
+        'targetLanguages': target_languages,
+        'segments': segment_records,
+        'segmentsCompleted': 0,
+        'mediaFormat': 'pcm',
+        'estimatedSeconds': estimate_transcription(transcribe_language, 'pcm', max(len(segment) for segment in segments)),
+        'trimmedSeconds': trimmed_seconds,
+        'audioFingerprint': audio_fingerprint,
+        'startTime': time.time()
+    }
+    job_store.create(job_info)
+    
+    return success_response({
+        'jobId': file_id,
+        'status': 'PROCESSING',
+        'message': f"Your audio is being processed in {len(segments)} segments. Check status with the jobId.",
+        'segments': {'completed': 0, 'total': len(segments)},
+        'retryAfterMs': retry_after_ms(job_info)
+    })
+
+def start_segments(file_id, segments, transcribe_language):
+    """Upload every segment and start its transcription job concurrently; returns the segment records"""
+    def start(index):
+        input_key = s3_keys.segment_input_key(file_id, index)
+        job_name = s3_keys.transcription_job_name(file_id, index)
+        s3.put_object(Bucket=INPUT_BUCKET, Key=input_key, Body=segments[index])
+        start_transcription_job(job_name, INPUT_BUCKET, input_key, transcribe_language, BATCH_MEDIA_FORMATS['pcm'])
+        return {
+            'transcriptionJobName': job_name,
+            'inputKey': input_key,
+            'bytes': len(segments[index]),
+            'status': 'TRANSCRIBING'
+        }
+    
+    with metrics.stage('segment_start'):
+        with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(segments))) as pool:
+            return list(pool.map(metrics.bind(start), range(len(segments))))
+
+def start_uploaded_wav(job_info, key, transcribe_language):
+    """Give a directly uploaded WAV the preprocessing and segmentation a posted one gets
+    
+    The normalized audio replaces the upload, to be transcribed as usual.
+    Returns True when the recording was long enough to be started as
+    segments instead.
+    """
+    if not audio_preprocess.available() or (job_info.get('audioBytes') or 0) > UPLOAD_PREPROCESS_MAX_BYTES:
+        return False
+    with metrics.stage('download'):
+        uploaded = s3.get_object(Bucket=INPUT_BUCKET, Key=key)['Body'].read()
+    audio_data, trimmed_seconds = preprocess_audio(uploaded, 'pcm')
+    
+    segments = split_recording(audio_data, 'pcm')
+    if segments:
+        segment_records = start_segments(job_info['jobId'], segments, transcribe_language)
+        job_store.update(job_info['jobId'], {
+            'segments': segment_records,
+            'segmentsCompleted': 0,
+            'estimatedSeconds': estimate_transcription(
+                transcribe_language, 'pcm', max(len(segment) for segment in segments)
+            ),
+            'trimmedSeconds': trimmed_seconds
+        }, {'status': 'TRANSCRIBING'})
+        return True
+    
+    if audio_data is not uploaded:
+        # The object-created event this raises is ignored, the job is no longer UPLOADING
+        with metrics.stage('upload'):
+            s3.put_object(Bucket=INPUT_BUCKET, Key=key, Body=ViewReader(audio_data))
+        job_store.update(job_info['jobId'], {
+            'audioBytes': len(audio_data),
+            'estimatedSeconds': estimate_transcription(transcribe_language, 'pcm', len(audio_data)),
+            'trimmedSeconds': trimmed_seconds
+        }, {'status': 'TRANSCRIBING'})
+    return False
+
+def segmented_job_status(job_info):
+    """Progress of a segmented job, completing segments whose transcript event is overdue"""
+    # Segment events normally arrive on their own; only ask Transcribe once
+    # they could be overdue, or to catch segments that failed
+    if time.time() - job_info.get('startTime', 0) > COMPLETION_GRACE_SECONDS:
+        for index, segment in enumerate(job_info['segments']):
+            if segment.get('status') == 'COMPLETED':
+                continue
+            response = transcribe.get_transcription_job(TranscriptionJobName=segment['transcriptionJobName'])
+            transcription_job = response['TranscriptionJob']
+            status = transcription_job['TranscriptionJobStatus']
+            if status == 'FAILED' or (status == 'COMPLETED' and completion_overdue(transcription_job)):
+                if status == 'COMPLETED':
+                    record_transcription_time(job_info, transcription_seconds(transcription_job), index)
+                job_info = complete_segment(job_info, index, transcribed=status == 'COMPLETED')
+    
+    if job_info.get('status') == 'COMPLETED':
+        return job_result_response(job_info)
+    
+    total = len(job_info['segments'])
+    completed = job_info.get('segmentsCompleted', 0)
+    return success_response({
+        'jobId': job_info['jobId'],
+        'status': 'PROCESSING',
+        'message': f"Transcribed {completed} of {total} segments",
+        'originalText': job_info.get('originalText', ''),
+        'results': job_info.get('results', {}),
+        'segments': {'completed': completed, 'total': total},
+        'retryAfterMs': retry_after_ms(job_info)
+    })
+
+def complete_segment(job_info, index, transcribed=True):
+    """Translate and synthesize one segment, stitching the job once every segment is done
+    
+    Segments are translated as soon as their own transcript is in, while later
+    ones are still being transcribed. Returns the updated job record.
+    """
+    if job_info['segments'][index].get('status') == 'COMPLETED':
+        return job_info
+    
+    completed = with_completion_lease(
+        job_info, lambda leased: finish_segment(leased, index, transcribed), lease_name=f"segment{index}"
+    )
+    if completed is None:
+        print(f"Segment {index} of job {job_info['jobId']} is being completed by another invocation")
+        return job_info
+    return completed
+
+def finish_segment(job_info, index, transcribed):
+    """Translate one segment and record it, stitching the job if it was the last one"""
+    target_languages = job_info.get('targetLanguages') or [job_info.get('targetLanguage')]
+    
+    text = ''
+    if transcribed:
+        try:
+            text = read_transcript(job_info['segments'][index]['transcriptionJobName'])
+        except Exception as e:
+            print(f"Error reading transcript of segment {index}: {str(e)}")
+    
+    results = {}
+    if text:
+        try:
+            results = translate_to_targets(text, job_info.get('sourceLanguage'), target_languages)
+        except Exception as e:
+            print(f"Error translating segment {index}: {str(e)}")
+    
+    stitch = False
+    
+    def mutate(record):
+        nonlocal stitch
+        stitch = False
+        segments = record['segments']
+        if segments[index].get('status') == 'COMPLETED':
+            return None
+        segments[index] = dict(segments[index], status='COMPLETED', text=text, results=results)
+        changes = dict(stitched_fields(record), segments=segments)
+        
+        # Whoever completes the last segment does the final stitching
+        if changes['segmentsCompleted'] == len(segments) and record.get('status') == 'TRANSCRIBING':
+            changes['status'] = 'STITCHING'
+            stitch = True
+        return changes
+    
+    job_info = job_store.modify(job_info['jobId'], mutate)
+    if stitch:
+        return finish_segmented_job(job_info)
+    return job_info
+
+def stitched_fields(job_info):
+    """Transcript and per-language results of the leading run of completed segments"""
+    target_languages = job_info.get('targetLanguages') or [job_info.get('targetLanguage')]
+    leading = []
+    for segment in job_info['segments']:
+        if segment.get('status') != 'COMPLETED':
+            break
+        leading.append(segment)
+    
+    results = {}
+    for language in target_languages:
+        parts = [segment['results'][language] for segment in leading if language in segment['results']]
+        parts = [part for part in parts if part['status'] == 'COMPLETED']
+        results[language] = {
+            'status': 'PROCESSING',
+            'translatedText': ' '.join(part['translatedText'] for part in parts),
+            'audioUrls': [part['audioUrl'] for part in parts]
+        }
+    
+    return {
+        'originalText': ' '.join(segment['text'] for segment in leading if segment['text']),
+        'results': results,
+        'segmentsCompleted': sum(1 for segment in job_info['segments'] if segment.get('status') == 'COMPLETED')
+    }
+
+def finish_segmented_job(job_info):
+    """Join the segments' transcripts and translations and concatenate their speech"""
+    job_id = job_info['jobId']
+    target_languages = job_info.get('targetLanguages') or [job_info.get('targetLanguage')]
+    segments = job_info['segments']
+    
+    if not any(segment['text'] for segment in segments):
+        return complete_job(job_info, "No speech detected in the audio", job_info.get('sourceLanguage'))
+    
+    def stitch(language):
+        parts = [segment['results'][language] for segment in segments if language in segment['results']]
+        parts = [part for part in parts if part['status'] == 'COMPLETED']
+        if not parts:
+            return {'status': 'FAILED', 'error': f"No segment could be translated to {language}"}
+        
+        # MP3 frames are self-contained, so the segments' speech can be joined byte for byte
+        output_key = s3_keys.output_key(job_id, language)
+        bodies = (s3.get_object(Bucket=INPUT_BUCKET, Key=part['outputKey'])['Body'] for part in parts)
+        upload_stream(s3, ConcatenatedStream(bodies), INPUT_BUCKET, output_key, 'audio/mpeg')
+        return {
+            'status': 'COMPLETED',
+            'translatedText': ' '.join(part['translatedText'] for part in parts),
+            'audioUrl': presigned_audio_url(output_key),
+            'outputKey': output_key
+        }
+    
+    with metrics.stage('stitch'):
+        with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(target_languages))) as pool:
+            results = dict(zip(target_languages, pool.map(metrics.bind(stitch), target_languages)))
+    
+    original_text = ' '.join(segment['text'] for segment in segments if segment['text'])
+    remember_transcript(job_info, original_text)
+    return job_store.update(job_id, dict(
+        result_fields(results, target_languages),
+        status='COMPLETED',
+        originalText=original_text,
+        completionTime=time.time()
+    ), {'status': 'STITCHING'})
+
+def complete_job_with_fallback(job_info):
+    """Complete a job whose transcript is unavailable with a placeholder text"""
+    fallback_text = f"Audio in {job_info.get('sourceLanguage')}"
+    return complete_job(job_info, fallback_text, 'en')
+
+def complete_job(job_info, original_text, source_language):
+    """Translate text, convert it to speech and mark the job completed"""
+    job_id = job_info['jobId']
+    target_languages = job_info.get('targetLanguages') or [job_info.get('targetLanguage')]
+    
+    # With several targets, publish each language as soon as it is ready
+    on_result = None
+    if len(target_languages) > 1:
+        def on_result(results):
+            job_store.update(job_id, {'results': results})
+    
+    # Long speech is published chunk by chunk; expose its first chunk for playback
+    def on_first_audio(target_language, audio_url):
+        def mutate(record):
+            changes = {'firstAudioUrls': dict(record.get('firstAudioUrls') or {}, **{target_language: audio_url})}
+            if target_language == target_languages[0]:
+                changes['firstAudioUrl'] = audio_url
+            return changes
+        job_store.modify(job_id, mutate)
+    
+    # Speech is only inlined in immediate responses. The job record keeps
+    # links instead, since base64 audio per language would soon outgrow a
+    # DynamoDB item (400 KB)
+    speech = dict(job_info.get('speech') or DEFAULT_SPEECH, inline=False)
+    results = translate_to_targets(original_text, source_language, target_languages, on_result, on_first_audio, speech)
+    metrics.set_property('translationCache', translation_cache.stats())
+    metrics.set_property('translationMemory', translation_memory.stats())
+    metrics.set_property('translationRoutes', translation_routes.stats())
+    metrics.set_property('resilience', resilience.stats())
+    
+    # Update job info, unless the job was failed (e.g. timed out) meanwhile
+    return job_store.update(job_id, dict(
+        result_fields(results, target_languages),
+        status='COMPLETED',
+        originalText=original_text,
+        completionTime=time.time()
+    ), {'status': job_info['status']})
+
+def immediate_response(job_id, original_text, source_language, target_languages, speech=None, **fields):
+    """Translate and synthesize a transcript now and answer with the completed job"""
+    # Translate and synthesize every target language concurrently
+    results = translate_to_targets(original_text, source_language, target_languages, speech=speech)
+    return success_response(dict(
+        result_fields(results, target_languages),
+        jobId=job_id,
+        status='COMPLETED',
+        originalText=original_text,
+        **fields
+    ))
+
+def translate_to_targets(original_text, source_language, target_languages, on_result=None, on_first_audio=None,
+                         speech=None):
+    """Translate and synthesize text for every target language on a bounded thread pool
+    
+    Returns {language: result}. on_result, if given, is called with a snapshot
+    of the results each time one language finishes. on_first_audio, if given,
+    is called with (language, url) when long speech has its first chunk ready.
+    speech holds the request's speech options (see speech_options).
+    """
+    results = {}
+    lock = threading.Lock()
+    
+    def finish(target_language):
+        try:
+            result = translate_and_synthesize(original_text, source_language, target_language, on_first_audio, speech)
+        except Exception as e:
+            print(f"Error processing target language {target_language}: {str(e)}")
+            result = {'status': 'FAILED', 'error': str(e)}
+        
+        with lock:
+            results[target_language] = result
+            if on_result is not None:
+                on_result(dict(results))
+    
+    if len(target_languages) == 1:
+        finish(target_languages[0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(target_languages))) as pool:
+            list(pool.map(metrics.bind(finish), target_languages))
+    
+    if all(result['status'] == 'FAILED' for result in results.values()):
+        raise Exception(results[target_languages[0]]['error'])
+    return results
+
+def translate_and_synthesize(original_text, source_language, target_language, on_first_audio=None, speech=None):
+    """Translate text into one language and convert it to speech"""
+    speech = speech or DEFAULT_SPEECH
+    
+    # Translate the text
+    translated_text = translate_text(original_text, source_language, target_language)
+    
+    first_chunk_ready = None
+    if on_first_audio is not None:
+        def first_chunk_ready(key):
+            on_first_audio(target_language, presigned_audio_url(key))
+    
+    # Timed once here, whether the speech ends up inline or in S3
+    audio = None
+    with metrics.stage('synthesize'):
+        # Short speech can go back in the response itself, skipping S3
+        if speech['inline']:
+            audio = inline_speech(translated_text, target_language, speech['format'], speech['sampleRate'])
+        
+        # Convert translated text to speech
+        if audio is None:
+            output_key = text_to_speech(
+                translated_text, target_language, INPUT_BUCKET, first_chunk_ready, speech['format'],
+                speech['sampleRate']
+            )
+    
+    if audio is not None:
+        return {
+            'status': 'COMPLETED',
+            'translatedText': translated_text,
+            'audioData': base64.b64encode(audio).decode('ascii'),
+            'audioContentType': SPEECH_FORMATS[speech['format']]
+        }
+    
+    # Generate a pre-signed URL for the output audio
+    with metrics.stage('presign'):
+        audio_url = presigned_audio_url(output_key)
+    
+    return {
+        'status': 'COMPLETED',
+        'translatedText': translated_text,
+        'audioUrl': audio_url,
+        'outputKey': output_key
+    }
+
+def presigned_audio_url(key):
+    """Pre-signed GET URL for an object in the bucket, valid for an hour"""
+    return s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': INPUT_BUCKET, 'Key': key},
+        ExpiresIn=3600  # URL expires in 1 hour
+    )
+
+def result_fields(results, target_languages):
+    """Job fields for a set of per-language results
+    
+    The first target language is also exposed at the top level, for clients
+    that only ask for one language.
+    """
+    first = results.get(target_languages[0], {})
+    fields = {
+        'results': results,
+        'translatedText': first.get('translatedText', ''),
+        'audioUrl': first.get('audioUrl', ''),
+        'outputKey': first.get('outputKey', '')
+    }
+    if 'audioData' in first:
+        fields['audioData'] = first['audioData']
+        fields['audioContentType'] = first['audioContentType']
+    return fields
+
+def read_transcript(transcription_job_name):
+    """Read the transcribed text written by Amazon Transcribe"""
+    transcript_response = s3.get_object(Bucket=INPUT_BUCKET, Key=s3_keys.transcript_key(transcription_job_name))
+    transcript_content = transcript_response['Body'].read().decode('utf-8')
+    transcription_result = json.loads(transcript_content)
+    
+    # Extract the transcribed text
+    return transcription_result.get('results', {}).get('transcripts', [{}])[0].get('transcript', '')
+
+def extract_boundary(content_type):
+    """Extract boundary from content-type header"""
+    _, params = parse_header_params(content_type)
+    boundary = params.get('boundary')
+    if not boundary:
+        return None
+    return boundary.encode('utf-8')
+
+def target_language_list(values):
+    """All requested target languages, from repeated and/or comma-separated values"""
+    target_languages = []
+    for value in values or ['es']:
+        for language in value.split(','):
+            language = language.strip()
+            # Unsupported languages are replaced with English
+            if language == 'fr' or language == 'id':
+                language = 'en'
+            if language and language not in target_languages:
+                target_languages.append(language)
+    return target_languages or ['es']
+
+def speech_options(request):
+    """Validated speech output options from a request's audioResponse, audioFormat and sampleRate fields"""
+    output_format = request.get('audioFormat') or 'mp3'
+    if output_format not in SPEECH_FORMATS:
+        raise ValueError(f"Unsupported audio format: {output_format}")
+    sample_rate = request.get('sampleRate')
+    sample_rate = str(sample_rate) if sample_rate else None
+    if sample_rate is not None and sample_rate not in SPEECH_SAMPLE_RATES:
+        raise ValueError(f"Unsupported sample rate: {sample_rate}")
+    return {'inline': request.get('audioResponse') == 'inline', 'format': output_format, 'sampleRate': sample_rate}
+
+def form_value(parts, name, default):
+    """Decode the first value of a text form field"""
+    values = parts.get(name)
+    if not values:
+        return default
+    return bytes(values[0]).decode('utf-8')
+
+def preprocess_audio(audio_data, media_format):
+    """Normalize PCM WAV uploads; returns (audio, seconds of silence trimmed)"""
+    if media_format != 'pcm' or not AUDIO_PREPROCESS or not audio_preprocess.available():
+        return audio_data, 0.0
+    try:
+        with metrics.stage('preprocess'):
+            normalized, stats = audio_preprocess.normalize_wav(audio_data)
+    except Exception as e:
+        print(f"Error preprocessing audio, using it as uploaded: {str(e)}")
+        return audio_data, 0.0
+    
+    metrics.record('trimmed_audio', stats['trimmedSeconds'] * 1000)
+    metrics.set_property('audioPreprocess', stats)
+    return normalized, stats['trimmedSeconds']
+
+def split_recording(audio_data, media_format):
+    """Split a long WAV recording at pauses; returns the segments, or None to transcribe it whole"""
+    if media_format != 'pcm' or not audio_preprocess.available():
+        return None
+    try:
+        duration = audio_duration(audio_data, media_format)
+        if duration <= SEGMENT_MIN_SECONDS:
+            return None
+        with metrics.stage('segment'):
+            segments = audio_preprocess.split_wav(audio_data, max(SEGMENT_SECONDS, duration / MAX_SEGMENTS))
+    except Exception as e:
+        print(f"Error splitting audio, transcribing it whole: {str(e)}")
+        return None
+    return segments if len(segments) > 1 else None
+
+def use_streaming_path(audio_data, media_format):
+    """Whether a clip is short enough, and in a format, for streaming transcription"""
+    if streaming_transcriber is None or media_format not in streaming_transcriber.formats:
+        return False
+    try:
+        duration = audio_duration(audio_data, media_format)
+    except Exception as e:
+        print(f"Error reading audio duration: {str(e)}")
+        return False
+    
+    # Compressed formats don't carry a cheap duration, so fall back to size
+    if duration is None:
+        return len(audio_data) <= SYNC_MAX_AUDIO_BYTES
+    return duration <= SYNC_MAX_AUDIO_SECONDS
+
+@metrics.timed('transcribe_start')
+def start_transcription_job(job_name, bucket, key, language_code, media_format='webm'):
     """Start an Amazon Transcribe job"""
     transcribe.start_transcription_job(
         TranscriptionJobName=job_name,
         Media={'MediaFileUri': f"s3://{bucket}/{key}"},
-        MediaFormat='webm',
+        MediaFormat=media_format,
         LanguageCode=language_code,
         OutputBucketName=INPUT_BUCKET,
-        OutputKey=f"transcripts/{job_name}.json"
+        OutputKey=s3_keys.transcript_key(job_name)
     )
     print(f"Started transcription job: {job_name} with language: {language_code}")
 
+@metrics.timed('translate')
 def translate_text(text, source_language, target_language):
     """Translate text using Amazon Translate"""
-    try:
-        # For non-English source languages, we need to handle transliteration
-        # Amazon Transcribe often outputs transliterated text (e.g., Hindi words written in English letters)
-        if source_language != 'en' and source_language != target_language:
-            # First translate to English as an intermediate step
-            # This helps with transliterated text
-            intermediate_response = translate.translate_text(
-                Text=text,
-                SourceLanguageCode='auto',  # Use auto-detection for transliterated text
-                TargetLanguageCode='en'     # Translate to English first
-            )
-            
-            intermediate_text = intermediate_response.get('TranslatedText', '')
-            
-            # Then translate from English to the target language
-            if target_language != 'en':
-                final_response = translate.translate_text(
-                    Text=intermediate_text,
-                    SourceLanguageCode='en',
-                    TargetLanguageCode=target_language
-                )
-                return final_response.get('TranslatedText', '')
-            else:
-                return intermediate_text
-        else:
-            # Direct translation for English source or when source and target are the same
-            response = translate.translate_text(
-                Text=text,
-                SourceLanguageCode=source_language,
-                TargetLanguageCode=target_language
-            )
-            return response.get('TranslatedText', '')
-    except Exception as e:
-        print(f"Error in translate_text: {str(e)}")
-        # Try with auto-detection if specific source language fails
+    # Try each route for this language pair in order of preference; the route
+    # table learns which ones fail and which are fastest
+    for route in translation_routes.routes(source_language, target_language):
+        call_seconds = []
+        
+        def timed_translate(*args):
+            start = time.time()
+            try:
+                return call_translate(*args)
+            finally:
+                call_seconds.append(time.time() - start)
+        
         try:
-            response = translate.translate_text(
-                Text=text,
-                SourceLanguageCode='auto',
-                TargetLanguageCode=target_language
-            )
-            return response.get('TranslatedText', '')
-        except Exception as e2:
-            print(f"Error in translate_text with auto-detection: {str(e2)}")
-            return f"Translation error: {str(e2)}"
+            translated_text = translate_via_route(text, source_language, target_language, route, timed_translate)
+        except Exception as e:
+            print(f"Error in translate_text with {route} route: {str(e)}")
+            # Throttling, timeouts or an open circuit say nothing about the route itself
+            if unsupported_language_pair(e):
+                translation_routes.record_failure(source_language, target_language, route)
+            continue
+        
+        # Cache hits say nothing about how fast a route is
+        if call_seconds:
+            translation_routes.record_latency(source_language, target_language, route, sum(call_seconds))
+        return translated_text
+    
+    # Try with auto-detection if every route failed
+    try:
+        return cached_translate(text, 'auto', target_language)
+    except Exception as e2:
+        print(f"Error in translate_text with auto-detection: {str(e2)}")
+        return f"Translation error: {str(e2)}"
+
+def unsupported_language_pair(error):
+    """Whether Amazon Translate rejected the language pair itself, rather than failing this once"""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') == 'UnsupportedLanguagePairException'
+
+def translate_via_route(text, source_language, target_language, route, translate_fn=None):
+    """Translate text along a single route, calling translate_fn (call_translate by default) on cache misses"""
+    if route == ROUTE_PIVOT:
+        # Amazon Transcribe often outputs transliterated text (e.g., Hindi words written in English letters),
+        # so first translate to English with auto-detection. The English pivot is cached
+        # on its own so any other target language can reuse it.
+        intermediate_text = cached_translate(text, 'auto', 'en', translate_fn)
+        if target_language == 'en':
+            return intermediate_text
+        return cached_translate(intermediate_text, 'en', target_language, translate_fn)
+    
+    if route == ROUTE_AUTO:
+        return cached_translate(text, 'auto', target_language, translate_fn)
+    
+    return cached_translate(text, source_language, target_language, translate_fn)
+
+def cached_translate(text, source_language, target_language, translate_fn=None):
+    """Translate text sentence by sentence, calling Amazon Translate (once) only for sentences not seen before"""
+    return translation_memory.translate(text, source_language, target_language, translate_fn or call_translate)
 
-def text_to_speech(text, language_code, bucket, key):
-    """Convert text to speech using Amazon Polly and save to S3"""
-    # Map language code to voice ID
-    voice_map = {
+def call_translate(text, source_language, target_language):
+    """Call Amazon Translate, hedged and behind the language pair's circuit breaker"""
+    def request():
+        return translate.translate_text(
+            Text=text,
+            SourceLanguageCode=source_language,
+            TargetLanguageCode=target_language
+        )
+    
+    response = resilience.call(
+        metrics.bind(request), f"translate:{size_class(len(text))}", f"translate:{source_language}-{target_language}"
+    )
+    return response.get('TranslatedText', '')
+
+# Map language code to voice ID
+POLLY_VOICES = {
         'en': 'Joanna',
         'es': 'Lupe',
         'de': 'Vicki',
@@ -610,47 +1548,193 @@ def text_to_speech(text, language_code, bucket, key):
         'pl': 'Ewa',
         'sv': 'Astrid',
         'da': 'Naja'
-    }
+}
+
+def text_to_speech(text, language_code, bucket, on_first_audio=None, output_format='mp3', sample_rate=None):
+    """Convert text to speech using Amazon Polly and save to S3, returning the object key
     
-    voice_id = voice_map.get(language_code, 'Joanna')
+    Outputs are content-addressed, so text that was already synthesized with the
+    same voice is served from S3 without calling Polly again. For text long
+    enough to be chunked, on_first_audio (if given) receives the key of the
+    first chunk before the rest is finished.
+    """
+    voice_id = POLLY_VOICES.get(language_code, 'Joanna')
     
     try:
-        # Generate speech
-        response = polly.synthesize_speech(
-            Text=text,
-            OutputFormat='mp3',
-            VoiceId=voice_id,
-            Engine='neural'
-        )
-        
-        # Save audio stream directly to S3
-        s3.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=response['AudioStream'].read()
-        )
-        print(f"Uploaded speech to s3://{bucket}/{key}")
+        return synthesize_speech(text, voice_id, 'neural', bucket, on_first_audio, output_format, sample_rate)
     except Exception as e:
         print(f"Error in text_to_speech: {str(e)}")
         # Try standard engine if neural fails
         try:
-            response = polly.synthesize_speech(
-                Text=text,
-                OutputFormat='mp3',
-                VoiceId=voice_id,
-                Engine='standard'
-            )
-            
-            s3.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=response['AudioStream'].read()
-            )
-            print(f"Uploaded speech using standard engine to s3://{bucket}/{key}")
+            return synthesize_speech(text, voice_id, 'standard', bucket, on_first_audio, output_format, sample_rate)
         except Exception as e2:
             print(f"Error in text_to_speech with standard engine: {str(e2)}")
             raise
 
+def inline_speech(text, language_code, output_format='mp3', sample_rate=None):
+    """Speech to return in the response body, or None if it is too long to inline
+    
+    Like text_to_speech, audio is content-addressed: speech already in S3 is
+    returned from there, and newly synthesized speech is stored under its
+    cache key (over INLINE_AUDIO_MAX_BYTES it is only stored, so
+    text_to_speech picks it up without synthesizing it again).
+    """
+    if len(text) > SPEECH_CHUNK_CHARS:
+        return None
+    voice_id = POLLY_VOICES.get(language_code, 'Joanna')
+    
+    try:
+        return inline_speech_with_engine(text, voice_id, 'neural', output_format, sample_rate)
+    except Exception as e:
+        print(f"Error in inline_speech: {str(e)}")
+        return inline_speech_with_engine(text, voice_id, 'standard', output_format, sample_rate)
+
+def inline_speech_with_engine(text, voice_id, engine, output_format, sample_rate):
+    """Cached or freshly synthesized speech from one engine, or None if it is too long to inline"""
+    key = s3_keys.synthesis_key(text, voice_id, engine, output_format, sample_rate)
+    try:
+        cached = s3.get_object(Bucket=INPUT_BUCKET, Key=key)
+    except s3.exceptions.NoSuchKey:
+        cached = None
+    except Exception as e:
+        # Without s3:ListBucket a missing key is a 403; like throttling, treat it as a miss
+        print(f"Error reading cached speech {key}: {str(e)}")
+        cached = None
+    if cached is not None:
+        with contextlib.closing(cached['Body']) as body:
+            if cached['ContentLength'] > INLINE_AUDIO_MAX_BYTES:
+                print(f"Cached speech too long to inline: s3://{INPUT_BUCKET}/{key}")
+                return None
+            print(f"Reusing cached speech s3://{INPUT_BUCKET}/{key}")
+            return body.read()
+    
+    response = call_polly(text, voice_id, engine, output_format, sample_rate)
+    content_type = response.get('ContentType', SPEECH_FORMATS[output_format])
+    audio_stream = response['AudioStream']
+    try:
+        audio = audio_stream.read(INLINE_AUDIO_MAX_BYTES + 1)
+        if len(audio) <= INLINE_AUDIO_MAX_BYTES:
+            s3.put_object(Bucket=INPUT_BUCKET, Key=key, Body=audio, ContentType=content_type)
+            return audio
+        
+        size = upload_stream(s3, ConcatenatedStream([io.BytesIO(audio), audio_stream]), INPUT_BUCKET, key, content_type)
+        print(f"Speech too long to inline ({size} bytes), stored as s3://{INPUT_BUCKET}/{key}")
+        return None
+    finally:
+        audio_stream.close()
+
+def synthesize_speech(text, voice_id, engine, bucket, on_first_audio=None, output_format='mp3', sample_rate=None):
+    """Synthesize text of any length into one audio object, in parallel chunks when it is long
+    
+    Chunks are stored (and cached) on their own, then joined in order into the
+    object for the whole text. MP3 frames are self-contained, so the join is a
+    plain byte concatenation that starts while later chunks are still rendering.
+    """
+    chunks = chunk_text(text, SPEECH_CHUNK_CHARS, SPEECH_FIRST_CHUNK_CHARS)
+    if len(chunks) == 1:
+        return synthesize_to_s3(text, voice_id, engine, bucket, output_format, sample_rate)
+    
+    # Other formats can't simply be concatenated
+    if output_format != 'mp3':
+        print(f"Joining {len(chunks)} speech chunks as MP3 instead of {output_format}")
+        output_format = 'mp3'
+    
+    key = s3_keys.synthesis_key(text, voice_id, engine, output_format, sample_rate)
+    if s3_object_exists(bucket, key):
+        print(f"Reusing cached speech s3://{bucket}/{key}")
+        return key
+    
+    def synthesize_chunk(index):
+        chunk_key = synthesize_to_s3(chunks[index], voice_id, engine, bucket, output_format, sample_rate)
+        if index == 0 and on_first_audio is not None:
+            try:
+                on_first_audio(chunk_key)
+            except Exception as e:
+                print(f"Error publishing first speech chunk: {str(e)}")
+        return chunk_key
+    
+    with ThreadPoolExecutor(max_workers=min(SPEECH_CHUNK_WORKERS, len(chunks))) as pool:
+        futures = [pool.submit(metrics.bind(synthesize_chunk), index) for index in range(len(chunks))]
+        bodies = (s3.get_object(Bucket=bucket, Key=future.result())['Body'] for future in futures)
+        size = upload_stream(s3, ConcatenatedStream(bodies), bucket, key, 'audio/mpeg')
+    
+    print(f"Joined {len(chunks)} speech chunks ({size} bytes) into s3://{bucket}/{key}")
+    return key
+
+def synthesize_to_s3(text, voice_id, engine, bucket, output_format='mp3', sample_rate=None):
+    """Synthesize speech into its content-addressed S3 key unless it is already there"""
+    key = s3_keys.synthesis_key(text, voice_id, engine, output_format, sample_rate)
+    
+    if s3_object_exists(bucket, key):
+        print(f"Reusing cached speech s3://{bucket}/{key}")
+        return key
+    
+    # Generate speech
+    response = call_polly(text, voice_id, engine, output_format, sample_rate)
+    
+    # Stream the audio into S3 while Polly is still producing it
+    audio_stream = response['AudioStream']
+    try:
+        size = upload_stream(s3, audio_stream, bucket, key, response.get('ContentType', 'audio/mpeg'))
+    finally:
+        audio_stream.close()
+    print(f"Uploaded {size} bytes of speech using {engine} engine to s3://{bucket}/{key}")
+    return key
+
+def call_polly(text, voice_id, engine, output_format, sample_rate=None):
+    """Call Amazon Polly, hedged and behind the circuit breaker for this voice and engine"""
+    request = polly_request(text, voice_id, engine, output_format, sample_rate)
+    return resilience.call(
+        metrics.bind(lambda: polly.synthesize_speech(**request)),
+        f"polly:{engine}:{size_class(len(text))}",
+        f"polly:{engine}:{voice_id}",
+        # A hedged request that lost still holds a connection until its stream is closed
+        discard=lambda response: response['AudioStream'].close()
+    )
+
+def polly_request(text, voice_id, engine, output_format, sample_rate=None):
+    """Arguments for polly.synthesize_speech; Polly picks the sample rate when none is given"""
+    request = {'Text': text, 'OutputFormat': output_format, 'VoiceId': voice_id, 'Engine': engine}
+    if sample_rate:
+        request['SampleRate'] = sample_rate
+    return request
+
+def s3_object_exists(bucket, key):
+    """Check whether an S3 object exists"""
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except Exception:
+        return False
+
+def job_result_response(job_info):
+    """Return the results of a completed job"""
+    body = {
+        'jobId': job_info['jobId'],
+        'status': 'COMPLETED',
+        'originalText': job_info.get('originalText', ''),
+        'translatedText': job_info.get('translatedText', ''),
+        'audioUrl': job_info.get('audioUrl', ''),
+        'results': job_info.get('results', {})
+    }
+    if job_info.get('audioData'):
+        body['audioData'] = job_info['audioData']
+        body['audioContentType'] = job_info['audioContentType']
+    return success_response(body)
+
+def success_response(body):
+    """Return a successful JSON response"""
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token'
+        },
+        'body': json.dumps(body)
+    }
+
 def error_response(message):
     """Return an error response"""
     return {
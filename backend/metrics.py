@@ -0,0 +1,147 @@
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# Request bodies longer than this are replaced by a size marker in logs
+LOG_BODY_LIMIT = 256
+
+# Headers that must never reach the logs
+REDACTED_HEADERS = {'authorization', 'x-api-key', 'x-amz-security-token', 'cookie'}
+
+
+class Invocation:
+    """What one invocation has collected so far"""
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.timings = {}
+        self.counts = {}
+        self.properties = {}
+        self.lock = threading.Lock()
+
+
+class Metrics:
+    """Stage timings and counters per invocation, each flushed as a single log record
+
+    Records are written in CloudWatch embedded metric format, so CloudWatch
+    turns them into metrics without any API calls. Stages that run more than
+    once (e.g. one synthesis per target language) keep every sample.
+
+    Each thread records into the invocation it is serving, so concurrent
+    requests in the self-hosted server keep separate records. Work handed to
+    a thread pool is attributed to the caller's invocation through bind().
+    """
+
+    def __init__(self, namespace='VoiceTranslator'):
+        self.namespace = namespace
+        self._local = threading.local()
+        # Used by threads that aren't serving any invocation
+        self._shared = Invocation('unknown')
+
+    def _current(self):
+        return getattr(self._local, 'invocation', None) or self._shared
+
+    def begin(self, operation='unknown'):
+        """Start collecting for a new invocation in this thread"""
+        self._local.invocation = Invocation(operation)
+
+    def bind(self, fn):
+        """Wrap fn so it records into the calling thread's invocation from any thread"""
+        invocation = self._current()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            previous = getattr(self._local, 'invocation', None)
+            self._local.invocation = invocation
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.invocation = previous
+        return wrapper
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name):
+        """Decorator timing every call of a function as stage `name`"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, milliseconds):
+        invocation = self._current()
+        with invocation.lock:
+            invocation.timings.setdefault(name, []).append(round(milliseconds, 3))
+
+    def count(self, name, value=1):
+        invocation = self._current()
+        with invocation.lock:
+            invocation.counts[name] = invocation.counts.get(name, 0) + value
+
+    def set_property(self, name, value):
+        """Attach a non-metric field (e.g. cache statistics) to the record"""
+        invocation = self._current()
+        with invocation.lock:
+            invocation.properties[name] = value
+
+    def flush(self):
+        """Print this thread's record and start over"""
+        invocation = self._current()
+        with invocation.lock:
+            if not invocation.timings and not invocation.counts:
+                return
+            definitions = [{'Name': name, 'Unit': 'Milliseconds'} for name in invocation.timings]
+            definitions += [{'Name': name, 'Unit': 'Count'} for name in invocation.counts]
+            record = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [['Operation']],
+                        'Metrics': definitions
+                    }]
+                },
+                'Operation': invocation.operation
+            }
+            record.update(invocation.properties)
+            record.update(invocation.timings)
+            record.update(invocation.counts)
+        print(json.dumps(record))
+        self.begin()
+
+
+def redact_event(event):
+    """Copy of a Lambda event that is safe and cheap to log"""
+    redacted = dict(event)
+
+    body = redacted.get('body')
+    if isinstance(body, str) and len(body) > LOG_BODY_LIMIT:
+        encoding = 'base64 ' if redacted.get('isBase64Encoded') else ''
+        redacted['body'] = f"<{len(body)} {encoding}chars omitted>"
+    elif isinstance(body, (bytes, bytearray, memoryview)):
+        # Raw bodies from the self-hosted server
+        redacted['body'] = f"<{len(body)} bytes omitted>"
+
+    for field in ('headers', 'multiValueHeaders'):
+        headers = redacted.get(field)
+        if headers:
+            redacted[field] = {
+                name: '<redacted>' if name.lower() in REDACTED_HEADERS else value
+                for name, value in headers.items()
+            }
+
+    # requestContext repeats the identity and authorizer details
+    redacted.pop('requestContext', None)
+    return redacted
@@ -0,0 +1,172 @@
+import io
+from urllib.parse import unquote
+
+
+class MultipartError(ValueError):
+    """Malformed or oversized multipart/form-data body"""
+
+
+class MultipartField:
+    """One form field; data is a memoryview into the request body, not a copy"""
+
+    __slots__ = ('name', 'filename', 'content_type', 'data')
+
+    def __init__(self, name, filename, content_type, data):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.data = data
+
+
+class ViewReader(io.RawIOBase):
+    """Seekable file object over a memoryview, so it can be uploaded without copying it first"""
+
+    def __init__(self, view):
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self.view) - self.pos)
+        buffer[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = max(0, min(offset, len(self.view)))
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def __len__(self):
+        return len(self.view)
+
+
+def parse_header_params(value):
+    """Split a header like `form-data; name="a"; filename="b.webm"` into (value, params)
+
+    Handles quoted strings with backslash escapes, semicolons inside quotes and
+    RFC 5987 extended parameters such as filename*=UTF-8''na%C3%AFve.webm.
+    """
+    params = {}
+    main, _, rest = value.partition(';')
+    i = 0
+    while i < len(rest):
+        eq = rest.find('=', i)
+        if eq == -1:
+            break
+        key = rest[i:eq].strip().strip(';').strip().lower()
+        i = eq + 1
+        while i < len(rest) and rest[i] == ' ':
+            i += 1
+
+        if i < len(rest) and rest[i] == '"':
+            chars = []
+            i += 1
+            while i < len(rest) and rest[i] != '"':
+                if rest[i] == '\\' and i + 1 < len(rest):
+                    i += 1
+                chars.append(rest[i])
+                i += 1
+            param = ''.join(chars)
+            i = rest.find(';', i)
+            i = len(rest) if i == -1 else i + 1
+        else:
+            end = rest.find(';', i)
+            end = len(rest) if end == -1 else end
+            param = rest[i:end].strip()
+            i = end + 1
+
+        if key.endswith('*'):
+            charset, _, encoded = param.partition("''")
+            key = key[:-1]
+            param = unquote(encoded, encoding=charset or 'utf-8')
+        elif key in params:
+            # An extended parameter takes precedence over its plain form
+            continue
+        params[key] = param
+
+    return main.strip().lower(), params
+
+def iter_multipart(body, boundary, max_field_size=None, max_total_size=None):
+    """Yield the fields of a multipart/form-data body without copying their contents
+
+    Boundaries are located with bytes.find and each field's data is a
+    memoryview slice of body. Raises MultipartError for malformed bodies and
+    for fields or bodies larger than the given limits.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not boundary:
+        raise MultipartError("Missing multipart boundary")
+    if max_total_size is not None and len(body) > max_total_size:
+        raise MultipartError(f"Request body exceeds {max_total_size} bytes")
+
+    view = memoryview(body)
+    delimiter = b'--' + boundary
+    pos = body.find(delimiter)
+    if pos == -1:
+        raise MultipartError("Multipart boundary not found in body")
+
+    while True:
+        pos += len(delimiter)
+        if body[pos:pos + 2] == b'--':
+            return
+
+        # Skip optional transport padding after the delimiter
+        line_end = body.find(b'\r\n', pos)
+        if line_end == -1:
+            raise MultipartError("Truncated multipart body")
+        headers_start = line_end + 2
+
+        if body[headers_start:headers_start + 2] == b'\r\n':
+            headers_end = headers_start
+            content_start = headers_start + 2
+        else:
+            headers_end = body.find(b'\r\n\r\n', headers_start)
+            if headers_end == -1:
+                raise MultipartError("Truncated multipart headers")
+            content_start = headers_end + 4
+
+        content_end = body.find(b'\r\n' + delimiter, content_start)
+        if content_end == -1:
+            raise MultipartError("Missing closing multipart boundary")
+
+        size = content_end - content_start
+        if max_field_size is not None and size > max_field_size:
+            raise MultipartError(f"Form field exceeds {max_field_size} bytes")
+
+        name = None
+        filename = None
+        content_type = None
+        for line in bytes(view[headers_start:headers_end]).decode('utf-8', 'replace').split('\r\n'):
+            header, _, value = line.partition(':')
+            header = header.strip().lower()
+            if header == 'content-disposition':
+                _, params = parse_header_params(value)
+                name = params.get('name')
+                filename = params.get('filename')
+            elif header == 'content-type':
+                content_type = value.strip()
+
+        if name is not None:
+            yield MultipartField(name, filename, content_type, view[content_start:content_end])
+
+        pos = content_end + 2
+
+def parse_multipart(body, boundary, max_field_size=None, max_total_size=None):
+    """Parse multipart form data into {field name: [memoryview, ...]}"""
+    parts = {}
+    for field in iter_multipart(body, boundary, max_field_size, max_total_size):
+        parts.setdefault(field.name, []).append(field.data)
+    return parts
@@ -0,0 +1,213 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Circuit states
+CLOSED = 'closed'        # calls go through
+OPEN = 'open'            # calls fail fast until the cooldown is over
+HALF_OPEN = 'half-open'  # one trial call decides whether to close again
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a path whose circuit is open"""
+
+    def __init__(self, circuit):
+        super().__init__(f"Circuit {circuit} is open")
+        self.circuit = circuit
+
+
+def size_class(length):
+    """Power-of-two bucket for a request size, so latencies are compared like for like"""
+    return 1 << max(0, (length - 1).bit_length())
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+class Circuit:
+    """Outcomes of recent calls down one path, and whether to keep calling it"""
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial = False
+
+    def failure_ratio(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class Resilience:
+    """Circuit breakers and hedged requests for calls to remote services
+
+    call(fn, latency_key, circuit_key) runs fn and:
+
+    - fails fast with CircuitOpen while circuit_key's circuit is open. A
+      circuit opens once at least min_calls calls were made down its path and
+      failure_ratio of the last circuit_window of them failed. It stays open
+      for open_seconds, then lets one trial call through, which closes it
+      again or reopens it.
+    - sends a second, identical request when the first has taken longer than
+      the hedge_percentile of recent successful calls with the same
+      latency_key, and returns whichever succeeds first. Hedging starts after
+      min_samples calls, never fires sooner than min_hedge_seconds, and is
+      capped at max_hedge_ratio of calls so a slow service isn't sent twice
+      the load. The losing response is passed to discard (e.g. to close its
+      stream).
+
+    Calls that can't be hedged yet run on the caller's thread. Hedgeable
+    ones run on a pool that starts a thread whenever none is idle (up to
+    max_workers, far above any real fan-out), and the hedge delay counts
+    from when the first attempt actually started, so a busy pool neither
+    delays calls nor sets off hedges.
+    """
+
+    def __init__(self, window=100, hedge_percentile=90, min_samples=20, min_hedge_seconds=0.05,
+                 max_hedge_ratio=0.15, circuit_window=20, failure_ratio=0.5, min_calls=5, open_seconds=30, max_workers=1024):
+        self.window = window
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.min_hedge_seconds = min_hedge_seconds
+        self.max_hedge_ratio = max_hedge_ratio
+        self.circuit_window = circuit_window
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.latencies = {}
+        self.circuits = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+
+    def call(self, fn, latency_key, circuit_key=None, discard=None):
+        """Return fn(), hedged and behind circuit_key's breaker"""
+        if circuit_key is not None and not self.allow(circuit_key):
+            raise CircuitOpen(circuit_key)
+        with self._lock:
+            self.calls += 1
+
+        started = threading.Event()
+
+        def attempt():
+            started.set()
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception:
+                self.record(latency_key, circuit_key, None)
+                raise
+            self.record(latency_key, circuit_key, time.perf_counter() - start)
+            return result
+
+        delay = self.hedge_delay(latency_key)
+        if delay is None:
+            return attempt()
+
+        attempts = [self._executor.submit(attempt)]
+        started.wait()
+        done, _ = wait(attempts, timeout=delay)
+        if not done and self.take_hedge():
+            print(f"Hedging {latency_key} after {delay * 1000:.0f} ms")
+            attempts.append(self._executor.submit(attempt))
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is not attempts[0]:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for other in set(done) - {future} | pending:
+                    other.add_done_callback(lambda f: self.discard(f, discard))
+                return future.result()
+        raise error
+
+    def discard(self, future, discard):
+        if discard is not None and future.exception() is None:
+            try:
+                discard(future.result())
+            except Exception as e:
+                print(f"Error discarding hedged response: {str(e)}")
+
+    def hedge_delay(self, latency_key):
+        """Seconds to wait before hedging a call, or None when it shouldn't be hedged"""
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            samples = list(self.latencies.get(latency_key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_hedge_seconds, percentile(samples, self.hedge_percentile))
+
+    def take_hedge(self):
+        with self._lock:
+            if self.hedges >= self.max_hedge_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def allow(self, circuit_key):
+        """Whether a call down this path may go ahead"""
+        with self._lock:
+            circuit = self.circuits.get(circuit_key)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN and time.time() - circuit.opened_at >= self.open_seconds:
+                circuit.state = HALF_OPEN
+                circuit.trial = False
+            if circuit.state == HALF_OPEN and not circuit.trial:
+                circuit.trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, latency_key, circuit_key, seconds):
+        """Record one finished call; seconds is None when it failed"""
+        with self._lock:
+            if seconds is not None:
+                self.latencies.setdefault(latency_key, deque(maxlen=self.window)).append(seconds)
+            if circuit_key is None or not self.failure_ratio:
+                return
+
+            circuit = self.circuits.setdefault(circuit_key, Circuit(self.circuit_window))
+            if circuit.state == HALF_OPEN:
+                if seconds is None:
+                    circuit.state = OPEN
+                    circuit.opened_at = time.time()
+                else:
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+                    print(f"Circuit {circuit_key} closed")
+                return
+
+            circuit.outcomes.append(seconds is not None)
+            if (circuit.state == CLOSED and len(circuit.outcomes) >= self.min_calls
+                    and circuit.failure_ratio() >= self.failure_ratio):
+                circuit.state = OPEN
+                circuit.opened_at = time.time()
+                print(f"Circuit {circuit_key} opened after {circuit.outcomes.count(False)} failures")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedgeWins': self.hedge_wins,
+                'rejected': self.rejected,
+                'openCircuits': sorted(key for key, circuit in self.circuits.items() if circuit.state != CLOSED),
+                'p95Ms': {
+                    key: round(percentile(samples, 95) * 1000, 1) for key, samples in self.latencies.items() if samples
+                },
+                'failureRatios': {
+                    key: round(circuit.failure_ratio(), 3) for key, circuit in self.circuits.items() if circuit.failure_ratio()
+                }
+            }
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import datetime
+
+# Top-level prefixes of the objects that belong to a job
+INPUT = 'input/'
+OUTPUT = 'output/'
+TRANSCRIPTS = 'transcripts/'
+JOBS = 'jobs/'
+JOB_PREFIXES = (INPUT, OUTPUT, TRANSCRIPTS, JOBS)
+
+# Caches shared by all jobs, keyed by content rather than by job
+TTS_CACHE = 'cache/tts/'
+TRANSLATION_CACHE = 'cache/translate/'
+FINGERPRINTS = 'cache/fingerprints/'
+TRANSCRIBE_DURATIONS = 'cache/transcribe-durations/'
+
+# File extension of speech in each Polly output format
+SPEECH_EXTENSIONS = {'mp3': 'mp3', 'ogg_vorbis': 'ogg', 'pcm': 'pcm'}
+
+# Under each prefix, a job's objects go to {shard}/{YYYY-MM-DD}/, where the
+# shard is the first SHARD_DIGITS hex digits of a hash of the job id. Every
+# shard gets its own S3 request-rate budget, and expired days can be listed
+# and deleted without reading the rest. Changing SHARD_DIGITS moves every key.
+SHARD_DIGITS = 1
+
+TRANSCRIPTION_JOB_PREFIX = 'transcribe-'
+SEGMENT_SEPARATOR = '-seg'
+
+
+def new_job_id():
+    """Time-ordered UUID (version 7): a millisecond timestamp followed by 74 random bits
+
+    The timestamp is what lets every key of the job be derived from its id
+    alone.
+    """
+    value = (int(time.time() * 1000) << 80) | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xf << 76)) | (0x7 << 76)  # version
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+def job_date(job_id):
+    """UTC day a job was created, or None for ids that don't carry one (older random UUIDs)"""
+    try:
+        parsed = uuid.UUID(job_id)
+    except ValueError:
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.datetime.fromtimestamp((parsed.int >> 80) / 1000, datetime.timezone.utc).date()
+
+def shard(job_id):
+    return hashlib.sha256(job_id.encode('utf-8')).hexdigest()[:SHARD_DIGITS]
+
+def job_prefix(prefix, job_id):
+    """prefix{shard}/{date}/ for a job; jobs created before the sharded layout keep the flat prefix"""
+    date = job_date(job_id)
+    if date is None:
+        return prefix
+    return f"{prefix}{shard(job_id)}/{date.isoformat()}/"
+
+
+def input_key(job_id, extension):
+    return f"{job_prefix(INPUT, job_id)}{job_id}.{extension}"
+
+def segment_input_key(job_id, index):
+    return f"{job_prefix(INPUT, job_id)}{job_id}{SEGMENT_SEPARATOR}{index}.wav"
+
+def output_key(job_id, language):
+    return f"{job_prefix(OUTPUT, job_id)}{job_id}-{language}.mp3"
+
+def job_key(job_id):
+    return f"{job_prefix(JOBS, job_id)}{job_id}.json"
+
+def synthesis_key(text, voice_id, engine, output_format, sample_rate=None):
+    """Key derived from everything that determines synthesized speech"""
+    # Speech at Polly's default rate keeps the keys it had before rates could be chosen
+    identity = [text, voice_id, engine, output_format] + ([sample_rate] if sample_rate else [])
+    digest = hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()
+    return f"{TTS_CACHE}{digest}.{SPEECH_EXTENSIONS[output_format]}"
+
+def transcription_job_name(job_id, segment=None):
+    """Amazon Transcribe job name for a job, or for one of its segments"""
+    name = f"{TRANSCRIPTION_JOB_PREFIX}{job_id}"
+    return name if segment is None else f"{name}{SEGMENT_SEPARATOR}{segment}"
+
+def transcript_key(transcription_job_name):
+    """Where Amazon Transcribe writes the transcript of a transcription job"""
+    job_id, _ = parse_transcription_job_name(transcription_job_name)
+    return f"{job_prefix(TRANSCRIPTS, job_id or transcription_job_name)}{transcription_job_name}.json"
+
+
+def parse_transcription_job_name(name):
+    """Map transcribe-{job_id}[-seg{n}] back to (job_id, segment index or None)"""
+    if not name.startswith(TRANSCRIPTION_JOB_PREFIX):
+        return None, None
+    name = name[len(TRANSCRIPTION_JOB_PREFIX):]
+    job_id, separator, segment = name.rpartition(SEGMENT_SEPARATOR)
+    if separator and segment.isdigit():
+        return job_id, int(segment)
+    return name, None
+
+def parse_transcript_key(key):
+    """Map a transcript key back to (job_id, segment index or None)"""
+    filename = key.rsplit('/', 1)[-1]
+    if not filename.endswith('.json'):
+        return None, None
+    return parse_transcription_job_name(filename[:-len('.json')])
+
+def job_id_from_input_key(key):
+    """Map an upload key back to its job_id (segment uploads don't map to a job)"""
+    filename = key.rsplit('/', 1)[-1]
+    job_id, _, _ = filename.partition('.')
+    if not key.startswith(INPUT) or SEGMENT_SEPARATOR in job_id:
+        return None
+    return job_id
+
+def is_input_key(key):
+    return key.startswith(INPUT)
+
+def parse_date_prefix(prefix):
+    """The day of a {prefix}{shard}/{YYYY-MM-DD}/ listing prefix, or None"""
+    try:
+        return datetime.date.fromisoformat(prefix.rstrip('/').rsplit('/', 1)[-1])
+    except ValueError:
+        return None
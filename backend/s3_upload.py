@@ -0,0 +1,82 @@
+# S3 rejects multipart parts smaller than 5 MiB, except for the last one
+MULTIPART_PART_SIZE = 5 * 1024 * 1024
+
+
+class ConcatenatedStream:
+    """Readable stream over several streams, one after the other"""
+
+    def __init__(self, streams):
+        self.streams = iter(streams)
+        self.current = next(self.streams, None)
+
+    def read(self, size=-1):
+        while self.current is not None:
+            data = self.current.read(size) if size is not None and size >= 0 else self.current.read()
+            if data:
+                return data
+            self.current.close()
+            self.current = next(self.streams, None)
+        return b''
+
+    def close(self):
+        # Streams not yet started are never opened when they come from a generator
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+def read_chunk(stream, size):
+    """Read up to size bytes, looping because streaming bodies may return short reads"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b''.join(chunks)
+
+def upload_stream(s3, stream, bucket, key, content_type=None, part_size=MULTIPART_PART_SIZE):
+    """Upload a readable stream to S3 holding at most one part in memory
+
+    Streams that fit in a single part are written with one put_object. Longer
+    streams are sent as a multipart upload while they are still being read, so
+    the upload overlaps with whatever is producing the stream. Returns the
+    number of bytes uploaded.
+    """
+    extra = {'ContentType': content_type} if content_type else {}
+
+    chunk = read_chunk(stream, part_size)
+    if len(chunk) < part_size:
+        s3.put_object(Bucket=bucket, Key=key, Body=chunk, **extra)
+        return len(chunk)
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, **extra)['UploadId']
+    parts = []
+    total = 0
+    try:
+        while chunk:
+            part_number = len(parts) + 1
+            response = s3.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=chunk
+            )
+            parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+            total += len(chunk)
+            chunk = read_chunk(stream, part_size)
+
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    return total
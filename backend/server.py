@@ -0,0 +1,170 @@
+import os
+import json
+import base64
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import aws_clients
+import lambda_function
+
+# Requests handled at once. Status checks are long-polled, so each one can
+# hold a worker for up to LONG_POLL_MAX_SECONDS.
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 32))
+
+# Idle keep-alive connections are closed after this long, freeing their worker
+KEEPALIVE_SECONDS = 15
+
+# AWS connections per worker in the shared client pools (for fan-out calls)
+CONNECTIONS_PER_WORKER = 4
+
+
+class BodyError(Exception):
+    """A request body that can't be accepted, with the HTTP status to answer"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def read_body(rfile, length):
+    """Read exactly length bytes from the socket into one preallocated buffer"""
+    body = bytearray(length)
+    view = memoryview(body)
+    received = 0
+    while received < length:
+        count = rfile.readinto(view[received:])
+        if not count:
+            raise BodyError(400, "Connection closed before the whole body arrived")
+        received += count
+    return body
+
+def request_event(method, target, headers, body):
+    """API Gateway (REST proxy integration) style event for an HTTP request
+
+    The body is passed as raw bytes rather than base64, which the handler
+    accepts as is.
+    """
+    url = urlsplit(target)
+    return {
+        'httpMethod': method,
+        'path': url.path,
+        'headers': dict(headers.items()),
+        'queryStringParameters': dict(parse_qsl(url.query)) or None,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+class LambdaRequestHandler(BaseHTTPRequestHandler):
+    """Serves lambda_handler over HTTP/1.1 with keep-alive"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_SECONDS
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_OPTIONS(self):
+        self.dispatch()
+
+    def dispatch(self):
+        try:
+            body = self.request_body()
+        except BodyError as e:
+            # The rest of the body is never read, so the connection can't be reused
+            self.close_connection = True
+            self.send_lambda_response(lambda_function.error_response(str(e)), e.status)
+            return
+
+        event = request_event(self.command, self.path, self.headers, body)
+        try:
+            response = lambda_function.lambda_handler(event, None)
+        except Exception as e:
+            print(f"Unhandled error serving {self.command} {self.path}: {str(e)}")
+            response = {'statusCode': 502, 'body': json.dumps({'error': 'Internal server error'})}
+        self.send_lambda_response(response)
+
+    def request_body(self):
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            raise BodyError(411, "Chunked request bodies are not supported, send Content-Length")
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > lambda_function.MAX_BODY_BYTES:
+            raise BodyError(413, f"Request body exceeds {lambda_function.MAX_BODY_BYTES} bytes")
+        return read_body(self.rfile, length) if length else None
+
+    def send_lambda_response(self, response, status=None):
+        body = response.get('body') or ''
+        body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+
+        self.send_response(status or response.get('statusCode', 200))
+        for name, value in (response.get('headers') or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # The handler already logs every request it receives
+        pass
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that serves connections on a fixed pool of worker threads
+
+    A keep-alive connection holds its worker until it is closed or has been
+    idle for KEEPALIVE_SECONDS, so size the pool for the number of open client
+    connections (e.g. the load balancer's).
+    """
+
+    def __init__(self, address, handler_class, workers=SERVER_WORKERS):
+        super().__init__(address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='worker')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_server(host='0.0.0.0', port=8080, workers=SERVER_WORKERS):
+    """Build the server; the AWS connection pools are sized for its workers"""
+    config = aws_clients.CLIENT_CONFIG
+    config['max_pool_connections'] = max(config['max_pool_connections'], workers * CONNECTIONS_PER_WORKER)
+    return PooledHTTPServer((host, port), LambdaRequestHandler, workers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the translator API over HTTP outside Lambda")
+    parser.add_argument('--host', default=os.environ.get('SERVER_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVER_PORT', 8080)))
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.workers)
+    # Build the AWS clients before the first request instead of on it
+    aws_clients.warm_up()
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers "
+          f"(bucket {lambda_function.INPUT_BUCKET})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,123 @@
+import os
+import struct
+import asyncio
+import importlib.util
+
+# Amazon Transcribe batch MediaFormat for each container we can recognize
+BATCH_MEDIA_FORMATS = {
+    'pcm': 'wav',
+    'ogg-opus': 'ogg',
+    'flac': 'flac',
+    'webm': 'webm'
+}
+
+FILE_EXTENSIONS = {
+    'pcm': 'wav',
+    'ogg-opus': 'ogg',
+    'flac': 'flac',
+    'webm': 'webm'
+}
+
+
+def detect_media_format(audio):
+    """Identify the audio container from its magic bytes"""
+    header = bytes(audio[:12])
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'pcm'
+    if header[:4] == b'OggS':
+        return 'ogg-opus'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    # Default to what the browser's MediaRecorder produces
+    return 'webm'
+
+def wav_info(audio):
+    """Return (sample_rate, channels, bits_per_sample, data_offset, data_length) of a WAV file"""
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(audio):
+        chunk_id = bytes(audio[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', audio, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            _, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', audio, body)
+            fmt = (sample_rate, channels, bits)
+        elif chunk_id == b'data' and fmt is not None:
+            return fmt + (body, min(chunk_size, len(audio) - body))
+        offset = body + chunk_size + (chunk_size & 1)
+    raise ValueError("Not a valid WAV file")
+
+def flac_sample_rate(audio):
+    """Sample rate from the FLAC STREAMINFO block"""
+    return (audio[18] << 12) | (audio[19] << 4) | (audio[20] >> 4)
+
+def audio_duration(audio, media_format):
+    """Duration in seconds when it can be read from the header, otherwise None"""
+    if media_format != 'pcm':
+        return None
+    sample_rate, channels, bits, _, data_length = wav_info(audio)
+    return data_length / float(sample_rate * channels * (bits // 8))
+
+
+class AmazonStreamingTranscriber:
+    """Transcribe short clips over Amazon Transcribe streaming
+
+    Needs the optional amazon-transcribe package. Any object with the same
+    formats attribute and transcribe() method can be used in its place, e.g. a
+    local stand-in for tests.
+    """
+
+    formats = {'pcm', 'ogg-opus', 'flac'}
+
+    def __init__(self, region=None, chunk_size=8192):
+        self.region = region or os.environ.get('AWS_REGION', 'us-east-1')
+        self.chunk_size = chunk_size
+
+    def transcribe(self, audio, media_format, language_code):
+        """Return the final transcript of a complete audio clip"""
+        if media_format == 'pcm':
+            sample_rate, channels, bits, offset, length = wav_info(audio)
+            if channels != 1 or bits != 16:
+                raise ValueError("Streaming transcription needs 16-bit mono PCM")
+            audio = memoryview(audio)[offset:offset + length]
+        elif media_format == 'flac':
+            sample_rate = flac_sample_rate(audio)
+        else:
+            sample_rate = 48000  # Opus always decodes at 48 kHz
+
+        return asyncio.run(self._transcribe(audio, media_format, language_code, sample_rate))
+
+    async def _transcribe(self, audio, media_format, language_code, sample_rate):
+        from amazon_transcribe.client import TranscribeStreamingClient
+
+        client = TranscribeStreamingClient(region=self.region)
+        stream = await client.start_stream_transcription(
+            language_code=language_code,
+            media_sample_rate_hz=sample_rate,
+            media_encoding=media_format
+        )
+
+        async def send_audio():
+            for start in range(0, len(audio), self.chunk_size):
+                await stream.input_stream.send_audio_event(audio_chunk=bytes(audio[start:start + self.chunk_size]))
+            await stream.input_stream.end_stream()
+
+        async def collect_transcript():
+            segments = []
+            async for event in stream.output_stream:
+                for result in event.transcript.results:
+                    if not result.is_partial and result.alternatives:
+                        segments.append(result.alternatives[0].transcript)
+            return ' '.join(segments)
+
+        _, transcript = await asyncio.gather(send_audio(), collect_transcript())
+        return transcript
+
+
+def default_transcriber():
+    """The streaming transcriber, or None when amazon-transcribe isn't installed"""
+    # Only check that the package exists; it is imported on first use
+    if importlib.util.find_spec('amazon_transcribe') is None:
+        print("amazon-transcribe not installed, short clips will use batch transcription")
+        return None
+    return AmazonStreamingTranscriber()
@@ -0,0 +1,99 @@
+import time
+import datetime
+
+from s3_keys import JOB_PREFIXES, parse_date_prefix
+
+# delete_objects takes at most this many keys per request
+DELETE_BATCH = 1000
+
+
+class Sweeper:
+    """Deletes job objects older than retention_seconds under the job prefixes
+
+    In the sharded layout (see s3_keys) whole days are dropped: each shard's
+    day prefixes are listed with a delimiter, and every object under a day
+    that ended before the cutoff is deleted with batched delete_objects calls.
+    Objects still in the old flat layout are deleted by their LastModified,
+    as is everything under aged_prefixes ({prefix: retention seconds}, for
+    caches keyed by content rather than by job). A sweep stops at the
+    deadline (epoch seconds) and the next one carries on.
+    """
+
+    def __init__(self, s3, bucket, prefixes=JOB_PREFIXES, retention_seconds=7 * 24 * 3600, aged_prefixes=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefixes = prefixes
+        self.retention_seconds = retention_seconds
+        self.aged_prefixes = aged_prefixes or {}
+
+    def sweep(self, deadline=None):
+        """Delete what has expired, returning counts and whether the sweep got through everything"""
+        cutoff = time.time() - self.retention_seconds
+        # A day has expired once all of it is older than the cutoff
+        cutoff_day = datetime.datetime.fromtimestamp(cutoff, datetime.timezone.utc).date()
+        stats = {'deleted': 0, 'days': 0, 'errors': 0, 'complete': True}
+        pending = []
+
+        def flush(force=False):
+            while len(pending) >= DELETE_BATCH or (force and pending):
+                batch = pending[:DELETE_BATCH]
+                del pending[:DELETE_BATCH]
+                failed = self.delete(batch)
+                stats['errors'] += failed
+                stats['deleted'] += len(batch) - failed
+
+        def out_of_time():
+            if deadline is not None and time.time() > deadline:
+                stats['complete'] = False
+            return not stats['complete']
+
+        for prefix in self.prefixes:
+            if out_of_time():
+                break
+            shard_prefixes = []
+            for page in self.pages(prefix, Delimiter='/'):
+                shard_prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+                # Objects written before the sharded layout
+                pending.extend(obj['Key'] for obj in page.get('Contents', []) if obj['LastModified'].timestamp() < cutoff)
+                flush()
+                if out_of_time():
+                    break
+
+            for shard_prefix in shard_prefixes:
+                if out_of_time():
+                    break
+                for page in self.pages(shard_prefix, Delimiter='/'):
+                    for common in page.get('CommonPrefixes', []):
+                        day = parse_date_prefix(common['Prefix'])
+                        if day is None or day >= cutoff_day or out_of_time():
+                            continue
+                        for day_page in self.pages(common['Prefix']):
+                            pending.extend(obj['Key'] for obj in day_page.get('Contents', []))
+                            flush()
+                        stats['days'] += 1
+
+        for prefix, retention_seconds in self.aged_prefixes.items():
+            aged_cutoff = time.time() - retention_seconds
+            for page in self.pages(prefix):
+                if out_of_time():
+                    break
+                pending.extend(obj['Key'] for obj in page.get('Contents', []) if obj['LastModified'].timestamp() < aged_cutoff)
+                flush()
+
+        flush(force=True)
+        return stats
+
+    def pages(self, prefix, **kwargs):
+        paginator = self.s3.get_paginator('list_objects_v2')
+        return paginator.paginate(Bucket=self.bucket, Prefix=prefix, **kwargs)
+
+    def delete(self, keys):
+        """Delete up to DELETE_BATCH keys in one request, returning how many failed"""
+        response = self.s3.delete_objects(
+            Bucket=self.bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+        errors = response.get('Errors', [])
+        for error in errors[:5]:
+            print(f"Could not delete s3://{self.bucket}/{error.get('Key')}: {error.get('Message')}")
+        return len(errors)
@@ -0,0 +1,46 @@
+import re
+
+# A sentence ends at terminal punctuation followed by whitespace, or right
+# after CJK full-width punctuation, which isn't followed by a space
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|(?<=[。！？])\s*')
+
+
+def split_sentences(text):
+    """Split text into sentences, keeping their terminal punctuation"""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def split_long(sentence, max_chars):
+    """Break a sentence longer than max_chars at whitespace, or anywhere if it has none"""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+def chunk_text(text, max_chars, first_chars=None):
+    """Pack whole sentences into chunks of at most max_chars, in order
+
+    first_chars, if given, caps the first chunk lower (where sentences allow),
+    so it is ready sooner.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = ''
+    for sentence in split_sentences(text):
+        for piece in split_long(sentence, max_chars):
+            limit = max_chars if chunks or first_chars is None else first_chars
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,261 @@
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from text_chunks import split_sentences
+
+# Amazon Translate accepts up to 10,000 bytes of text per request
+MAX_REQUEST_BYTES = 9000
+
+# Target languages whose sentences are written without a space between them
+UNSPACED_LANGUAGES = {'ja', 'zh', 'zh-TW'}
+
+
+def normalize_text(text):
+    """Normalize text so trivially different utterances share a cache entry"""
+    text = unicodedata.normalize('NFKC', text)
+    return ' '.join(text.split()).casefold()
+
+def cache_key(text, source_language, target_language):
+    """Build the cache key for a text and language pair"""
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{source_language}-{target_language}/{digest}"
+
+
+class LRUCache:
+    """Thread-safe in-process LRU, kept alive across warm Lambda invocations"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class S3CacheBackend:
+    """Shared cache tier storing one JSON object per entry under an S3 prefix
+
+    Entries expire after ttl_seconds. Expired objects are deleted by the
+    scheduled Sweeper (give it the prefix in aged_prefixes), not by requests.
+    """
+
+    def __init__(self, s3, bucket, prefix='cache/translate/', ttl_seconds=30 * 24 * 3600):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + key + '.json')
+            entry = json.loads(response['Body'].read().decode('utf-8'))
+        except Exception as e:
+            if 'NoSuchKey' not in str(e):
+                print(f"Error reading cache entry {self.prefix}{key}: {str(e)}")
+            return None
+
+        if entry.get('expiresAt', 0) < time.time():
+            return None
+        return entry.get('value')
+
+    def put(self, key, value):
+        entry = {'value': value, 'expiresAt': time.time() + self.ttl_seconds}
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self.prefix + key + '.json',
+                Body=json.dumps(entry),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            print(f"Error writing cache entry {self.prefix}{key}: {str(e)}")
+
+
+class MemoryCacheBackend:
+    """Process-local stand-in for S3CacheBackend, with the same TTL behaviour"""
+
+    def __init__(self, ttl_seconds=30 * 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expiresAt'] < time.time():
+                del self._entries[key]
+                return None
+            return entry['value']
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = {'value': value, 'expiresAt': time.time() + self.ttl_seconds}
+
+
+class TranslationCache:
+    """In-process LRU in front of an optional shared backend
+
+    The backend only needs get(key) and put(key, value) methods.
+    """
+
+    def __init__(self, backend=None, maxsize=1024):
+        self.memory = LRUCache(maxsize)
+        self.backend = backend
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, text, source_language, target_language):
+        key = cache_key(text, source_language, target_language)
+
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self.memory.put(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, source_language, target_language, value):
+        key = cache_key(text, source_language, target_language)
+        self.memory.put(key, value)
+        if self.backend is not None:
+            self.backend.put(key, value)
+
+    def stats(self):
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        return {
+            'memoryHits': self.memory_hits,
+            'sharedHits': self.shared_hits,
+            'misses': self.misses,
+            'hitRate': round((self.memory_hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            'memoryEntries': len(self.memory)
+        }
+
+
+class TranslationMemory:
+    """Sentence-level reuse of translations on top of a TranslationCache
+
+    Text is split into sentences, each looked up in the cache on its own
+    (normalized, per language pair), so an utterance that repeats most of an
+    earlier one only pays for the new sentences. The misses are sent to the
+    translator together, one per line, and the result is reassembled in the
+    original order.
+    """
+
+    def __init__(self, cache, workers=8):
+        self.cache = cache
+        self.workers = workers
+        self.sentence_hits = 0
+        self.sentence_misses = 0
+        self.chars_billed = 0
+        self.chars_saved = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text, source_language, target_language, translate_fn):
+        """Translate text, calling translate_fn(text, source, target) only for unseen sentences"""
+        sentences = split_sentences(text) or [text]
+        translations = self.lookup(sentences, source_language, target_language)
+
+        misses = [i for i, translation in enumerate(translations) if translation is None]
+        translated = []
+        for batch in self.batches([sentences[i] for i in misses]):
+            translated += self.translate_batch(batch, source_language, target_language, translate_fn)
+        for i, translation in zip(misses, translated):
+            translations[i] = translation
+        self.concurrently(
+            lambda i: self.cache.put(sentences[i], source_language, target_language, translations[i]), misses
+        )
+
+        billed = sum(len(sentences[i]) for i in misses)
+        with self._lock:
+            self.sentence_hits += len(sentences) - len(misses)
+            self.sentence_misses += len(misses)
+            self.chars_billed += billed
+            self.chars_saved += sum(len(sentence) for sentence in sentences) - billed
+
+        separator = '' if target_language in UNSPACED_LANGUAGES else ' '
+        return separator.join(translations)
+
+    def lookup(self, sentences, source_language, target_language):
+        """Cached translation of each sentence, or None"""
+        return self.concurrently(lambda sentence: self.cache.get(sentence, source_language, target_language), sentences)
+
+    def concurrently(self, fn, items):
+        """[fn(item) for item in items], in parallel since each may be a round trip to the shared tier"""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    def batches(self, sentences):
+        """Group sentences into requests within Translate's size limit"""
+        batch, size = [], 0
+        for sentence in sentences:
+            length = len(sentence.encode('utf-8')) + 1
+            if batch and size + length > MAX_REQUEST_BYTES:
+                yield batch
+                batch, size = [], 0
+            batch.append(sentence)
+            size += length
+        if batch:
+            yield batch
+
+    def translate_batch(self, sentences, source_language, target_language, translate_fn):
+        """Translate sentences in one request, one per line
+
+        If the translation doesn't come back with one line per sentence, the
+        sentences are translated one by one instead.
+        """
+        lines = [' '.join(sentence.split()) for sentence in sentences]
+        if len(lines) == 1:
+            return [translate_fn(lines[0], source_language, target_language)]
+
+        translated = translate_fn('\n'.join(lines), source_language, target_language).split('\n')
+        if len(translated) == len(lines):
+            return [line.strip() for line in translated]
+        print(f"Batched translation returned {len(translated)} lines for {len(lines)} sentences, translating them one by one")
+        return [translate_fn(line, source_language, target_language) for line in lines]
+
+    def stats(self):
+        lookups = self.sentence_hits + self.sentence_misses
+        return {
+            'sentenceHits': self.sentence_hits,
+            'sentenceMisses': self.sentence_misses,
+            'sentenceHitRate': round(self.sentence_hits / lookups, 3) if lookups else 0.0,
+            'charsBilled': self.chars_billed,
+            'charsSaved': self.chars_saved
+        }
@@ -0,0 +1,82 @@
+import threading
+
+# Ways of getting from a source to a target language with Amazon Translate
+DIRECT = 'direct'  # source -> target
+PIVOT = 'pivot'    # auto -> en -> target, for transliterated transcripts
+AUTO = 'auto'      # auto -> target
+
+ROUTES = (DIRECT, PIVOT, AUTO)
+
+# Languages Transcribe writes in their own (Latin) script, so their transcripts
+# can be translated between each other without the English pivot
+DIRECT_LANGUAGES = {'en', 'es', 'de', 'it', 'pt', 'nl', 'sv', 'da', 'pl', 'tr'}
+
+
+class RouteTable:
+    """Pick a Translate route per language pair and learn from how routes perform
+
+    overrides maps "source-target" (either side may be "*") to an ordered list
+    of candidate routes, e.g. {"hi-*": ["auto", "pivot"]}. A direct route that
+    Translate rejects as an unsupported pair is demoted for that pair for the
+    lifetime of the container (callers only report such failures). Among the
+    remaining candidates, each is tried once and then the one with the lowest
+    smoothed latency wins.
+    """
+
+    def __init__(self, overrides=None, latency_alpha=0.2):
+        self.overrides = overrides or {}
+        self.latency_alpha = latency_alpha
+        self.latency = {}
+        self.demoted = set()
+        self._lock = threading.Lock()
+
+    def candidates(self, source_language, target_language):
+        """Configured routes for a pair, most preferred first"""
+        for pattern in (f"{source_language}-{target_language}", f"{source_language}-*", f"*-{target_language}"):
+            if pattern in self.overrides:
+                return [route for route in self.overrides[pattern] if route in ROUTES]
+
+        if source_language == 'en' or source_language == target_language:
+            return [DIRECT]
+        if source_language in DIRECT_LANGUAGES and target_language in DIRECT_LANGUAGES:
+            return [DIRECT, PIVOT]
+        return [PIVOT]
+
+    def routes(self, source_language, target_language):
+        """Routes to try for a pair, best first, always ending with a usable one"""
+        candidates = self.candidates(source_language, target_language) or [PIVOT]
+        with self._lock:
+            usable = [route for route in candidates if (source_language, target_language, route) not in self.demoted]
+            if not usable:
+                return [PIVOT]
+
+            untried = [route for route in usable if (source_language, target_language, route) not in self.latency]
+            if untried:
+                best = untried[0]
+            else:
+                best = min(usable, key=lambda route: self.latency[(source_language, target_language, route)])
+
+        return [best] + [route for route in usable if route != best]
+
+    def record_latency(self, source_language, target_language, route, seconds):
+        key = (source_language, target_language, route)
+        with self._lock:
+            previous = self.latency.get(key)
+            if previous is None:
+                self.latency[key] = seconds
+            else:
+                self.latency[key] = previous + self.latency_alpha * (seconds - previous)
+
+    def record_failure(self, source_language, target_language, route):
+        if route != DIRECT:
+            return
+        with self._lock:
+            self.demoted.add((source_language, target_language, route))
+        print(f"Demoted direct translation route {source_language}->{target_language} to pivot")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'latency': {f"{s}-{t}:{r}": round(v, 3) for (s, t, r), v in self.latency.items()},
+                'demoted': sorted(f"{s}-{t}" for s, t, _ in self.demoted)
+            }
@@ -19,15 +19,18 @@ const themeToggle = document.querySelector('.theme-toggle');
 
 // Variables
 let mediaRecorder;
+let recordingMimeType = 'audio/webm';
 let audioChunks = [];
 let recordingStartTime;
 let timerInterval;
 let recordingDuration = 10000; // 10 seconds in milliseconds
 let isDarkMode = false;
-let statusCheckInterval;
 let currentJobId;
-let statusCheckCount = 0;
-const MAX_STATUS_CHECKS = 10; // Limit status checks to prevent infinite loops
+let previewAudioUrl = null; // First chunk of long speech, played before the rest is ready
+const MAX_STATUS_SECONDS = 15 * 60; // Safety net; the server fails jobs that overrun their expected time
+const STATUS_WAIT_SECONDS = 20; // How long the server may hold each status request
+const INLINE_AUDIO = true; // Ask for short translated speech inside the response instead of a link to S3
+const SYNC_MAX_AUDIO_BYTES = 50000; // Keep in step with the Lambda's SYNC_MAX_AUDIO_BYTES
 
 // Event Listeners
 recordButton.addEventListener('click', toggleRecording);
@@ -57,17 +60,14 @@ async function startRecording() {
         // Reset UI
         resetUI();
         
-        // Clear any existing status check interval
-        if (statusCheckInterval) {
-            clearInterval(statusCheckInterval);
-            statusCheckInterval = null;
-        }
-        
         // Request microphone access
         const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
         
-        // Create MediaRecorder instance
-        mediaRecorder = new MediaRecorder(stream, { mimeType: 'audio/webm' });
+        // Create MediaRecorder instance. Short Ogg/Opus clips are sent with the
+        // request, and the Lambda can stream them to Transcribe for an immediate
+        // result, so prefer it where the browser supports it
+        recordingMimeType = MediaRecorder.isTypeSupported('audio/ogg;codecs=opus') ? 'audio/ogg' : 'audio/webm';
+        mediaRecorder = new MediaRecorder(stream, { mimeType: recordingMimeType });
         
         // Event handlers
         mediaRecorder.ondataavailable = (event) => {
@@ -143,57 +143,27 @@ async function processAudio() {
         animateProgress();
         
         // Create audio blob
-        const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
-        
-        // Create form data for upload
-        const formData = new FormData();
-        formData.append('audio', audioBlob, 'recording.webm');
-        formData.append('sourceLanguage', sourceLanguage.value);
-        formData.append('targetLanguage', targetLanguage.value);
+        const audioBlob = new Blob(audioChunks, { type: recordingMimeType });
         
-        // Upload to API Gateway
+        // Upload the audio
         statusMessage.textContent = 'Uploading audio...';
         
-        // IMPORTANT: DO NOT set Content-Type for FormData
-        // Let the browser set it automatically with the correct boundary
-        const headers = {};
-        
-        // Add API key if provided
-        if (API_KEY) {
-            headers['x-api-key'] = API_KEY;
-        }
-        
-        console.log('Sending request to:', API_ENDPOINT);
-        console.log('FormData contains audio:', formData.has('audio'));
-        console.log('FormData contains sourceLanguage:', formData.has('sourceLanguage'));
-        console.log('FormData contains targetLanguage:', formData.has('targetLanguage'));
+        // Short clips go in the request itself, so the Lambda can transcribe them
+        // over a streaming connection and answer right away; anything else is
+        // uploaded straight to S3 and transcribed by a batch job
+        const sendInline = recordingMimeType === 'audio/ogg' && audioBlob.size <= SYNC_MAX_AUDIO_BYTES;
+        const result = sendInline ? await sendWithRequest(audioBlob) : await uploadDirect(audioBlob);
         
-        const response = await fetch(API_ENDPOINT, {
-            method: 'POST',
-            headers: headers,
-            body: formData
-        });
-        
-        if (!response.ok) {
-            throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+        if (result.status === 'COMPLETED') {
+            displayResults(result);
+            return;
         }
         
-        const result = await response.json();
+        currentJobId = result.jobId;
+        statusMessage.textContent = 'Processing your audio...';
         
-        // Check if this is an asynchronous job
-        if (result.jobId && result.status === 'PROCESSING') {
-            currentJobId = result.jobId;
-            statusMessage.textContent = 'Processing your audio...';
-            
-            // Reset status check count
-            statusCheckCount = 0;
-            
-            // Start checking status
-            startStatusCheck(result.jobId);
-        } else {
-            // Handle immediate result
-            displayResults(result);
-        }
+        // Start checking status
+        startStatusCheck(result.jobId);
         
     } catch (error) {
         console.error('Error processing audio:', error);
@@ -202,28 +172,97 @@ async function processAudio() {
     }
 }
 
-function startStatusCheck(jobId) {
-    // Clear any existing interval
-    if (statusCheckInterval) {
-        clearInterval(statusCheckInterval);
+function requestHeaders(headers) {
+    // Add API key if provided
+    if (API_KEY) {
+        headers['x-api-key'] = API_KEY;
+    }
+    return headers;
+}
+
+async function sendWithRequest(audioBlob) {
+    const formData = new FormData();
+    formData.append('audio', audioBlob, 'recording.ogg');
+    formData.append('sourceLanguage', sourceLanguage.value);
+    formData.append('targetLanguage', targetLanguage.value);
+    formData.append('audioResponse', INLINE_AUDIO ? 'inline' : 'url');
+    
+    // Don't set Content-Type for FormData; the browser adds it with the boundary
+    console.log('Sending request to:', API_ENDPOINT);
+    const response = await fetch(API_ENDPOINT, {
+        method: 'POST',
+        headers: requestHeaders({}),
+        body: formData
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+    }
+    
+    const result = await response.json();
+    if (!result.jobId && result.status !== 'COMPLETED') {
+        throw new Error(result.error || 'Unexpected response from the server');
+    }
+    return result;
+}
+
+async function uploadDirect(audioBlob) {
+    // Ask for a presigned upload; the audio itself goes straight to S3
+    console.log('Sending request to:', API_ENDPOINT);
+    const response = await fetch(API_ENDPOINT, {
+        method: 'POST',
+        headers: requestHeaders({ 'Content-Type': 'application/json' }),
+        body: JSON.stringify({
+            sourceLanguage: sourceLanguage.value,
+            targetLanguage: targetLanguage.value,
+            contentType: recordingMimeType,
+            audioResponse: INLINE_AUDIO ? 'inline' : 'url'
+        })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+    }
+    
+    const job = await response.json();
+    if (!job.upload) {
+        throw new Error(job.error || 'No upload URL received');
+    }
+    
+    // The policy fields must come before the file in the form
+    const formData = new FormData();
+    Object.entries(job.upload.fields).forEach(([name, value]) => formData.append(name, value));
+    formData.append('file', audioBlob);
+    
+    const uploadResponse = await fetch(job.upload.url, {
+        method: 'POST',
+        body: formData
+    });
+    
+    if (!uploadResponse.ok) {
+        throw new Error(`Upload failed with ${uploadResponse.status}: ${uploadResponse.statusText}`);
     }
     
-    // Set up status check interval
-    statusCheckInterval = setInterval(async () => {
+    // Processing starts once S3 has the audio
+    return { jobId: job.jobId, status: 'PROCESSING' };
+}
+
+async function startStatusCheck(jobId) {
+    let errorCount = 0;
+    const startedAt = Date.now();
+    
+    // Each request is held open by the server until the job finishes or
+    // STATUS_WAIT_SECONDS pass, so only a few round trips are needed
+    while (currentJobId === jobId) {
+        // If the job has been running far too long, stop checking
+        if (Date.now() - startedAt > MAX_STATUS_SECONDS * 1000) {
+            statusMessage.textContent = 'Processing timed out. Please try again.';
+            progressContainer.classList.add('hidden');
+            return;
+        }
+        
         try {
-            // Increment check count
-            statusCheckCount++;
-            
-            // If we've checked too many times, stop checking
-            if (statusCheckCount > MAX_STATUS_CHECKS) {
-                clearInterval(statusCheckInterval);
-                statusCheckInterval = null;
-                statusMessage.textContent = 'Processing timed out. Please try again.';
-                progressContainer.classList.add('hidden');
-                return;
-            }
-            
-            const statusUrl = `${API_ENDPOINT}?jobId=${jobId}`;
+            const statusUrl = `${API_ENDPOINT}?jobId=${jobId}&wait=${STATUS_WAIT_SECONDS}`;
             const response = await fetch(statusUrl);
             
             if (!response.ok) {
@@ -234,33 +273,49 @@ function startStatusCheck(jobId) {
             
             if (result.status === 'COMPLETED') {
                 // Job is complete, display results
-                clearInterval(statusCheckInterval);
-                statusCheckInterval = null;
                 displayResults(result);
+                return;
             } else if (result.status === 'FAILED') {
                 // Job failed
-                clearInterval(statusCheckInterval);
-                statusCheckInterval = null;
                 statusMessage.textContent = `Error: ${result.error || 'Processing failed'}`;
                 progressContainer.classList.add('hidden');
+                return;
             } else {
                 // Still processing
                 statusMessage.textContent = result.message || 'Still processing your audio...';
+                
+                // Long translations publish their first speech chunk early
+                if (result.firstAudioUrl && !previewAudioUrl) {
+                    previewAudioUrl = result.firstAudioUrl;
+                    translatedAudio.src = previewAudioUrl;
+                    translatedAudio.load();
+                    translatedText.textContent = 'Playing the beginning while the rest is rendered...';
+                    resultContainer.classList.remove('hidden');
+                    translatedAudio.play().catch(() => {});
+                }
+                
+                // retryAfterMs is when the server expects the job to be done; the
+                // next held request covers STATUS_WAIT_SECONDS of it, so only
+                // wait out the rest before sending it
+                const idleMs = (result.retryAfterMs || 0) - STATUS_WAIT_SECONDS * 1000;
+                if (idleMs > 0) {
+                    await new Promise(resolve => setTimeout(resolve, idleMs));
+                }
             }
             
         } catch (error) {
             console.error('Error checking job status:', error);
             
             // If we get an error, stop checking after a few attempts
-            statusCheckCount++;
-            if (statusCheckCount > 3) {
-                clearInterval(statusCheckInterval);
-                statusCheckInterval = null;
+            errorCount++;
+            if (errorCount > 3) {
                 statusMessage.textContent = `Error checking status: ${error.message}`;
                 progressContainer.classList.add('hidden');
+                return;
             }
+            await new Promise(resolve => setTimeout(resolve, 3000));
         }
-    }, 3000); // Check every 3 seconds
+    }
 }
 
 function animateProgress() {
@@ -290,10 +345,24 @@ function displayResults(result) {
     originalText.textContent = result.originalText || 'No text detected';
     translatedText.textContent = result.translatedText || 'Translation not available';
     
-    if (result.audioUrl) {
-        translatedAudio.src = result.audioUrl;
+    // Short speech may come inline, ready to play without another download
+    const audioSrc = result.audioData
+        ? `data:${result.audioContentType};base64,${result.audioData}`
+        : result.audioUrl;
+    
+    if (audioSrc) {
+        // The full clip starts with the preview chunk, so continue from where the preview got to
+        const resumeAt = previewAudioUrl && !translatedAudio.paused ? translatedAudio.currentTime : null;
+        translatedAudio.src = audioSrc;
         translatedAudio.load();
+        if (resumeAt !== null) {
+            translatedAudio.addEventListener('loadedmetadata', () => {
+                translatedAudio.currentTime = resumeAt;
+                translatedAudio.play().catch(() => {});
+            }, { once: true });
+        }
     }
+    previewAudioUrl = null;
     
     // Show results container
     setTimeout(() => {
@@ -310,7 +379,7 @@ function resetUI() {
     progressContainer.classList.add('hidden');
     resultContainer.classList.add('hidden');
     currentJobId = null;
-    statusCheckCount = 0;
+    previewAudioUrl = null;
 }
 
 function toggleDarkMode() {